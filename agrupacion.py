@@ -0,0 +1,68 @@
+"""
+Agrupación en rejilla de puntos del mapa para zooms bajos.
+
+Con bbox + zoom, los endpoints de marcadores devuelven grupos (número de
+elementos, incidencias y campañas por celda, en el centroide de la celda)
+en lugar de un punto por recurso, así que el tamaño de la respuesta y el
+número de marcadores del cliente no dependen de cuántos recursos hay.
+"""
+import math
+
+import numpy as np
+
+# A partir de este zoom se devuelven puntos individuales
+ZOOM_PUNTOS = 15
+
+# Lado de la celda de agrupación en píxeles de pantalla
+CELDA_PIXELES = 60
+
+
+def tamano_celda(zoom, lat_referencia):
+    """(grados de latitud, grados de longitud) que ocupan CELDA_PIXELES en ese zoom."""
+    dlon = CELDA_PIXELES * 360.0 / (256 * 2 ** zoom)
+    dlat = dlon * max(math.cos(math.radians(lat_referencia)), 0.01)
+    return dlat, dlon
+
+
+def agrupar(lats, lons, zoom, pesos=None):
+    """
+    Agrupa los puntos en celdas de la rejilla del zoom.
+
+    Args:
+        lats, lons: coordenadas de los puntos
+        zoom: nivel de zoom de Leaflet
+        pesos: {nombre: valores por punto} que se suman por grupo
+
+    Returns:
+        (grupos, etiquetas): lista de dicts {lat, lon, total, **sumas} y,
+        para cada punto, el índice de su grupo
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if lats.size == 0:
+        return [], np.zeros(0, dtype=int)
+
+    dlat, dlon = tamano_celda(zoom, float(lats.mean()))
+    celdas = np.stack([np.floor(lats / dlat), np.floor(lons / dlon)], axis=1).astype(np.int64)
+    _, etiquetas, totales = np.unique(celdas, axis=0, return_inverse=True, return_counts=True)
+    etiquetas = etiquetas.ravel()
+
+    # Centroide de los puntos de cada celda
+    centro_lat = np.bincount(etiquetas, weights=lats) / totales
+    centro_lon = np.bincount(etiquetas, weights=lons) / totales
+    sumas = {
+        nombre: np.bincount(etiquetas, weights=np.asarray(valores, dtype=float), minlength=len(totales))
+        for nombre, valores in (pesos or {}).items()
+    }
+
+    grupos = []
+    for g in range(len(totales)):
+        grupo = {
+            'lat': round(float(centro_lat[g]), 6),
+            'lon': round(float(centro_lon[g]), 6),
+            'total': int(totales[g]),
+        }
+        for nombre, valores in sumas.items():
+            grupo[nombre] = int(valores[g])
+        grupos.append(grupo)
+    return grupos, etiquetas
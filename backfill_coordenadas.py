@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para geocodificar y guardar en lote las coordenadas del mobiliario
+que aún no las tiene (PuntoX/PuntoY = 0 o nulos).
+
+Uso:
+    python backfill_coordenadas.py --desde 2024-01-01 --hasta 2024-12-31
+    python backfill_coordenadas.py --limite 100 --dry-run
+"""
+
+import argparse
+from datetime import date
+
+from config.database import db_connection
+from escritura_coordenadas import actualizar_coordenadas_lote
+from geocodificacion import geocode_address
+from snapshots import MOBILIARIO, get_snapshot
+
+
+def emplazamientos_sin_coordenadas(fecha_desde, fecha_hasta):
+    """[(emplazamiento, descripción, dirección)] del mobiliario sin coordenadas y con dirección."""
+    snapshot = get_snapshot(MOBILIARIO, fecha_desde, fecha_hasta)
+    pendientes = []
+    for row in snapshot.rows:
+        if snapshot.value(row, 'PuntoX') and snapshot.value(row, 'PuntoY'):
+            continue
+        direccion = str(snapshot.value(row, 'Dirección') or '').strip()
+        if not direccion:
+            continue
+        pendientes.append((
+            str(snapshot.value(row, 'Nº Emplazamiento')).strip(),
+            snapshot.value(row, 'Descripción') or '',
+            direccion,
+        ))
+    return pendientes
+
+
+def guardar_lote(lote, dry_run=False):
+    """Escribe un lote de (emplazamiento, lat, lon) y muestra el resultado de cada fila."""
+    if dry_run:
+        for emplazamiento, lat, lon in lote:
+            print(f"  [dry-run] {emplazamiento}: {lat}, {lon}")
+        return {}
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        resultados = actualizar_coordenadas_lote(cursor, lote)
+        conn.commit()
+        cursor.close()
+
+    for emplazamiento, lat, lon in lote:
+        estado = resultados.get(emplazamiento)
+        print(f"  {emplazamiento}: {estado} ({lat}, {lon})")
+    return resultados
+
+
+def main():
+    hoy = date.today().strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description="Geocodifica el mobiliario sin coordenadas")
+    parser.add_argument('--desde', default=hoy, help="Fecha desde (YYYY-MM-DD), por defecto hoy")
+    parser.add_argument('--hasta', default=hoy, help="Fecha hasta (YYYY-MM-DD), por defecto hoy")
+    parser.add_argument('--lote', type=int, default=200, help="Coordenadas por escritura en BD")
+    parser.add_argument('--limite', type=int, default=0, help="Máximo de emplazamientos (0 = todos)")
+    parser.add_argument('--dry-run', action='store_true', help="Geocodificar sin escribir en la BD")
+    args = parser.parse_args()
+
+    pendientes = emplazamientos_sin_coordenadas(args.desde, args.hasta)
+    if args.limite:
+        pendientes = pendientes[:args.limite]
+    print(f"Emplazamientos sin coordenadas con dirección: {len(pendientes)}")
+
+    totales = {}
+    sin_resultado = 0
+    lote = []
+    for i, (emplazamiento, descripcion, direccion) in enumerate(pendientes, 1):
+        lat, lon = geocode_address(emplazamiento, descripcion, direccion)
+        if not lat or not lon:
+            sin_resultado += 1
+            print(f"[{i}/{len(pendientes)}] {emplazamiento}: sin resultado ({direccion})")
+            continue
+        lote.append((emplazamiento, lat, lon))
+        if len(lote) >= args.lote:
+            for estado in guardar_lote(lote, args.dry_run).values():
+                totales[estado] = totales.get(estado, 0) + 1
+            lote = []
+    if lote:
+        for estado in guardar_lote(lote, args.dry_run).values():
+            totales[estado] = totales.get(estado, 0) + 1
+
+    print("\nResumen:")
+    print(f"  Sin resultado de geocodificación: {sin_resultado}")
+    for estado, total in sorted(totales.items()):
+        print(f"  {estado}: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark de la serialización de resultados: clean_data + jsonify
+(camino anterior) frente a SerializadorFilas + ProveedorJSONRapido y frente
+a SerializadorFilas.json (fila a texto sin dict, el de los streams), sobre
+un resultado sintético de 20.000 filas con columnas como las de
+RecursosPorFechasGlobal.
+
+Uso:
+    python bench_serializacion.py [--filas 20000] [--repeticiones 5]
+"""
+
+import argparse
+import datetime
+import decimal
+import random
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from serializacion import ProveedorJSONRapido, SerializadorFilas, clean_data, orjson
+
+# (nombre, type_code) como en cursor.description de pyodbc
+DESCRIPCION = [
+    ('No_', str), ('Name', str), ('PuntoX', decimal.Decimal), ('PuntoY', decimal.Decimal),
+    ('Incidencia', int), ('Campañas', int), ('Tipo Recurso', str), ('Empresa', str),
+    ('Ruta', str), ('Familia', str), ('Fecha Alta', datetime.datetime), ('Foto', bytes),
+]
+
+
+def filas_sinteticas(n):
+    random.seed(42)
+    inicio = datetime.datetime(2024, 1, 1)
+    return [
+        (
+            f"R{i:06d}", f"Recurso {i}",
+            decimal.Decimal(f"{2.5 + random.random():.6f}"),
+            decimal.Decimal(f"{39.3 + random.random():.6f}"),
+            random.randint(0, 3), random.randint(0, 2),
+            random.choice(('Marquesina', 'Mupi', 'Valla')), random.choice(('EMT', 'TIB', 'Malla')),
+            f"Ruta {i % 40}", random.choice(('A', 'B', 'C')),
+            inicio + datetime.timedelta(minutes=i), b'' if i % 3 else b'jpg',
+        )
+        for i in range(n)
+    ]
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        tamano = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    print(f"{nombre:<40} mejor {min(tiempos) * 1000:8.1f} ms   media "
+          f"{sum(tiempos) / len(tiempos) * 1000:8.1f} ms   {tamano / 1024:,.0f} KiB")
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de filas")
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    filas = filas_sinteticas(args.filas)
+    columnas = [c[0] for c in DESCRIPCION]
+
+    app_anterior = Flask('anterior')
+    app_anterior.json = DefaultJSONProvider(app_anterior)
+    app_rapida = Flask('rapida')
+    app_rapida.json = ProveedorJSONRapido(app_rapida)
+
+    def camino_anterior():
+        with app_anterior.app_context():
+            datos = [clean_data(dict(zip(columnas, row))) for row in filas]
+            return len(app_anterior.json.response({'datos': datos}).get_data())
+
+    def camino_nuevo():
+        with app_rapida.app_context():
+            serializador = SerializadorFilas(DESCRIPCION)
+            datos = serializador.dicts(filas)
+            return len(app_rapida.json.response({'datos': datos}).get_data())
+
+    def camino_texto():
+        serializador = SerializadorFilas(DESCRIPCION)
+        return len(('[' + ','.join([serializador.json(row) for row in filas]) + ']').encode('utf-8'))
+
+    print(f"{args.filas} filas, {args.repeticiones} repeticiones, orjson: {'sí' if orjson else 'no'}")
+    anterior = medir("clean_data + jsonify", camino_anterior, args.repeticiones)
+    nuevo = medir("SerializadorFilas + ProveedorJSONRapido", camino_nuevo, args.repeticiones)
+    texto = medir("SerializadorFilas.json", camino_texto, args.repeticiones)
+    print(f"Mejora: x{anterior / nuevo:.1f} (dicts), x{anterior / texto:.1f} (texto directo)")
+
+
+if __name__ == "__main__":
+    main()
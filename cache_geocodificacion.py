@@ -0,0 +1,232 @@
+"""
+Caché persistente (SQLite) de resultados de geocodificación.
+
+Las llamadas a Google, Photon, Bing y Nominatim se guardan por proveedor y
+consulta normalizada, de modo que la misma dirección no se vuelve a pagar
+ni a esperar en cada búsqueda ni tras reiniciar el servidor.
+
+- TTL distinto para resultados positivos y negativos (sin resultado)
+- Los fallos del proveedor (ErrorGeocodificacion) no se guardan, para que
+  una caída o una API key mal configurada no deje direcciones sin resolver
+  durante todo el TTL negativo
+- Número máximo de entradas: se expulsan las usadas hace más tiempo
+- Contadores de aciertos y fallos para /api/stats
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+_ESPACIOS = re.compile(r'\s+')
+_SEPARADORES = re.compile(r'\s*([,;|])\s*')
+
+
+def normalizar(texto):
+    """Normaliza una consulta: minúsculas, sin tildes y con espacios uniformes."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = _ESPACIOS.sub(' ', texto.lower()).strip(' ,;.')
+    return _SEPARADORES.sub(r'\1 ', texto).strip()
+
+
+class ErrorGeocodificacion(Exception):
+    """
+    Fallo del proveedor (timeout, error HTTP, REQUEST_DENIED, falta de API
+    key...). No es un "sin resultado": no se guarda en la caché.
+    """
+
+
+def _es_negativo(valor):
+    """Sin resultado: None, lista vacía o (None, None)."""
+    if not valor:
+        return True
+    if isinstance(valor, (tuple, list)) and all(v is None for v in valor):
+        return True
+    return False
+
+
+def _clave_argumento(valor):
+    if isinstance(valor, float):
+        return f"{valor:.6f}"
+    return normalizar(valor)
+
+
+class CacheGeocodificacion:
+    """Tabla (proveedor, consulta) -> resultado JSON en un fichero SQLite."""
+
+    def __init__(self, ruta, ttl_positivo=30 * 86400, ttl_negativo=6 * 3600,
+                 max_entradas=50000):
+        self.ruta = ruta
+        self.ttl_positivo = ttl_positivo
+        self.ttl_negativo = ttl_negativo
+        self.max_entradas = max_entradas
+        self._conn = None
+        self._escrituras = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0,
+            'provider_errors': 0,
+        }
+
+    def _conexion(self):
+        # Se abre la primera vez que se usa (en el hilo que sea)
+        if self._conn is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conn = sqlite3.connect(self.ruta, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocodificacion (
+                    proveedor TEXT NOT NULL,
+                    consulta TEXT NOT NULL,
+                    resultado TEXT NOT NULL,
+                    negativo INTEGER NOT NULL,
+                    creado REAL NOT NULL,
+                    usado REAL NOT NULL,
+                    PRIMARY KEY (proveedor, consulta)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_geocodificacion_usado ON geocodificacion (usado)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def obtener(self, proveedor, consulta):
+        """Devuelve (encontrado, valor)."""
+        consulta = normalizar(consulta)
+        ahora = time.time()
+        with self._lock:
+            try:
+                conn = self._conexion()
+                fila = conn.execute(
+                    "SELECT resultado, negativo, creado FROM geocodificacion WHERE proveedor = ? AND consulta = ?",
+                    (proveedor, consulta),
+                ).fetchone()
+                if fila is None:
+                    self._stats['misses'] += 1
+                    return False, None
+                resultado, negativo, creado = fila
+                ttl = self.ttl_negativo if negativo else self.ttl_positivo
+                if ahora - creado >= ttl:
+                    conn.execute(
+                        "DELETE FROM geocodificacion WHERE proveedor = ? AND consulta = ?",
+                        (proveedor, consulta),
+                    )
+                    conn.commit()
+                    self._stats['expired'] += 1
+                    self._stats['misses'] += 1
+                    return False, None
+                conn.execute(
+                    "UPDATE geocodificacion SET usado = ? WHERE proveedor = ? AND consulta = ?",
+                    (ahora, proveedor, consulta),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error leyendo la caché de geocodificación: {e}")
+                self._stats['errors'] += 1
+                return False, None
+            self._stats['negative_hits' if negativo else 'hits'] += 1
+        return True, json.loads(resultado)
+
+    def guardar(self, proveedor, consulta, valor):
+        """Guarda un resultado (None, vacío o (None, None) cuenta como negativo)."""
+        consulta = normalizar(consulta)
+        resultado = json.dumps(valor)
+        negativo = 1 if _es_negativo(valor) else 0
+        ahora = time.time()
+        with self._lock:
+            try:
+                conn = self._conexion()
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocodificacion "
+                    "(proveedor, consulta, resultado, negativo, creado, usado) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (proveedor, consulta, resultado, negativo, ahora, ahora),
+                )
+                self._stats['stores'] += 1
+                self._escrituras += 1
+                # Comprobar el tamaño cada cierto número de escrituras
+                if self._escrituras % 100 == 0:
+                    self._expulsar(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error guardando en la caché de geocodificación: {e}")
+                self._stats['errors'] += 1
+
+    def _expulsar(self, conn):
+        total = conn.execute("SELECT COUNT(*) FROM geocodificacion").fetchone()[0]
+        sobrantes = total - self.max_entradas
+        if sobrantes > 0:
+            conn.execute(
+                "DELETE FROM geocodificacion WHERE rowid IN "
+                "(SELECT rowid FROM geocodificacion ORDER BY usado LIMIT ?)",
+                (sobrantes,),
+            )
+            self._stats['evictions'] += sobrantes
+
+    def cacheado(self, proveedor, decodificar=None, si_error=lambda: None):
+        """
+        Decorador para una función de geocodificación: la clave es el
+        proveedor más los argumentos normalizados. `decodificar` convierte el
+        valor leído de la caché (JSON) al tipo que devuelve la función. Si la
+        función lanza ErrorGeocodificacion se devuelve si_error() sin guardarlo.
+        """
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltorio(*args, **kwargs):
+                partes = [_clave_argumento(a) for a in args]
+                partes += [f"{k}={_clave_argumento(v)}" for k, v in sorted(kwargs.items())]
+                consulta = '|'.join(partes)
+                encontrado, valor = self.obtener(proveedor, consulta)
+                if not encontrado:
+                    try:
+                        valor = funcion(*args, **kwargs)
+                    except ErrorGeocodificacion as e:
+                        print(f"Error de {proveedor} (no se guarda en caché): {e}")
+                        with self._lock:
+                            self._stats['provider_errors'] += 1
+                        return si_error()
+                    self.guardar(proveedor, consulta, valor)
+                    return valor
+                return decodificar(valor) if decodificar and valor is not None else valor
+            return envoltorio
+        return decorador
+
+    def stats(self):
+        with self._lock:
+            try:
+                entradas = self._conexion().execute("SELECT COUNT(*) FROM geocodificacion").fetchone()[0]
+            except sqlite3.Error:
+                entradas = None
+            return {
+                'ruta': self.ruta,
+                'entradas': entradas,
+                'max_entradas': self.max_entradas,
+                'ttl_positivo': self.ttl_positivo,
+                'ttl_negativo': self.ttl_negativo,
+                **self._stats,
+            }
+
+
+cache = CacheGeocodificacion(
+    ruta=os.getenv(
+        'GEOCODING_CACHE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'geocodificacion.sqlite3'),
+    ),
+    ttl_positivo=int(os.getenv('GEOCODING_CACHE_TTL', str(30 * 86400))),
+    ttl_negativo=int(os.getenv('GEOCODING_CACHE_NEGATIVE_TTL', str(6 * 3600))),
+    max_entradas=int(os.getenv('GEOCODING_CACHE_MAX_ENTRIES', '50000')),
+)
@@ -0,0 +1,137 @@
+"""
+Caché de las incidencias abiertas de BC por usuario GTask.
+
+Cada clic en un marcador (/api/incidencias-abiertas) hacía una consulta
+OData a ListaIncidencias por recurso y filtraba el usuario en Python. Aquí
+se cargan de una vez todas las incidencias abiertas del usuario, agrupadas
+por recurso, y las consultas de cada marcador son búsquedas en un dict:
+
+- Pasado `ttl`, se siguen sirviendo los datos guardados y se recargan en
+  segundo plano (una sola recarga por usuario a la vez)
+- Pasado `max_edad` (o si no hay datos) la recarga se espera
+- Si la carga falla, o no termina en `espera_maxima` segundos (sigue en
+  segundo plano), se devuelve None y quien llama usa la consulta por recurso
+- invalidar() descarta también el resultado de las cargas que ya estaban
+  en curso (generación por usuario)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+
+class CacheIncidenciasUsuario:
+    """
+    cargar(gtask_user_id) -> {recurso: [incidencias]}; puede lanzar excepción.
+    """
+
+    def __init__(self, cargar, ttl=60, max_edad=600, max_usuarios=200, max_workers=2,
+                 espera_maxima=5):
+        self._cargar = cargar
+        self.ttl = ttl
+        self.max_edad = max_edad
+        self.max_usuarios = max_usuarios
+        self.espera_maxima = espera_maxima
+        self._usuarios = OrderedDict()  # usuario -> (cargado_en, {recurso: [incidencias]})
+        self._cargas = {}  # usuario -> Future de la carga en curso
+        self._generaciones = {}  # usuario -> generación (sube con invalidar)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='incidencias-bc')
+        self._stats = {
+            'hits': 0, 'misses': 0, 'refrescos': 0, 'errors': 0, 'evictions': 0,
+            'timeouts': 0, 'descartadas': 0,
+        }
+
+    def _cargar_usuario(self, usuario, generacion):
+        try:
+            por_recurso = self._cargar(usuario)
+        except Exception as e:
+            print(f"Error cargando incidencias abiertas del usuario GTask {usuario}: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+                if self._generaciones.get(usuario, 0) == generacion:
+                    self._cargas.pop(usuario, None)
+            return None
+        with self._lock:
+            if self._generaciones.get(usuario, 0) != generacion:
+                # Se invalidó mientras se cargaba: el resultado puede estar anticuado
+                self._stats['descartadas'] += 1
+                return None
+            self._usuarios[usuario] = (time.time(), por_recurso)
+            self._usuarios.move_to_end(usuario)
+            while len(self._usuarios) > self.max_usuarios:
+                self._usuarios.popitem(last=False)
+                self._stats['evictions'] += 1
+            self._cargas.pop(usuario, None)
+        return por_recurso
+
+    def _lanzar_carga(self, usuario):
+        """Future de la carga del usuario (la que ya está en curso si la hay). Con el lock tomado."""
+        futuro = self._cargas.get(usuario)
+        if futuro is None:
+            futuro = self._executor.submit(
+                self._cargar_usuario, usuario, self._generaciones.get(usuario, 0)
+            )
+            self._cargas[usuario] = futuro
+        return futuro
+
+    def incidencias(self, usuario, recurso):
+        """Incidencias abiertas del usuario en el recurso, o None si no se han podido cargar."""
+        usuario = str(usuario).strip()
+        recurso = str(recurso).strip()
+        with self._lock:
+            entrada = self._usuarios.get(usuario)
+            edad = time.time() - entrada[0] if entrada is not None else None
+            if entrada is not None and edad < self.max_edad:
+                self._usuarios.move_to_end(usuario)
+                self._stats['hits'] += 1
+                if edad >= self.ttl and usuario not in self._cargas:
+                    self._stats['refrescos'] += 1
+                    self._lanzar_carga(usuario)
+                return list(entrada[1].get(recurso, []))
+            self._stats['misses'] += 1
+            futuro = self._lanzar_carga(usuario)
+
+        try:
+            por_recurso = futuro.result(timeout=self.espera_maxima)
+        except FuturesTimeoutError:
+            # La carga sigue en segundo plano y servirá a las siguientes peticiones
+            with self._lock:
+                self._stats['timeouts'] += 1
+            return None
+        if por_recurso is None:
+            return None
+        return list(por_recurso.get(recurso, []))
+
+    def invalidar(self, usuario):
+        """Olvida las incidencias del usuario (p. ej. tras crear una en BC)."""
+        usuario = str(usuario).strip()
+        with self._lock:
+            self._usuarios.pop(usuario, None)
+            self._generaciones[usuario] = self._generaciones.get(usuario, 0) + 1
+            # La carga en curso (si hay) se descartará; la siguiente lanza otra
+            self._cargas.pop(usuario, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'max_edad': self.max_edad,
+                'usuarios': len(self._usuarios),
+                'max_usuarios': self.max_usuarios,
+                'espera_maxima': self.espera_maxima,
+                'cargas_en_curso': len(self._cargas),
+                **self._stats,
+            }
+
+
+def crear_cache(cargar):
+    """Caché con la configuración de las variables de entorno INCIDENCIAS_BC_CACHE_*."""
+    return CacheIncidenciasUsuario(
+        cargar,
+        ttl=int(os.getenv('INCIDENCIAS_BC_CACHE_TTL', '60')),
+        max_edad=int(os.getenv('INCIDENCIAS_BC_CACHE_MAX_AGE', '600')),
+        max_usuarios=int(os.getenv('INCIDENCIAS_BC_CACHE_MAX_USERS', '200')),
+        espera_maxima=float(os.getenv('INCIDENCIAS_BC_CACHE_WAIT', '5')),
+    )
@@ -0,0 +1,173 @@
+"""
+Caché por teselas de los lugares de Google Places (farmacias, hospitales...).
+
+Cada búsqueda (lat, lon, radio) se reparte en teselas cuadradas de un
+nivel elegido según el radio, y por cada tipo de lugar se guardan los
+lugares de cada tesela con TTL. Las búsquedas cercanas o solapadas
+reutilizan las teselas ya cargadas y solo se consulta a Places la parte que
+falta, lo que ahorra latencia y coste de la API.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from distancias import distancias_a_punto
+from indice_espacial import KM_POR_GRADO
+
+# Lado de las teselas en km: se usa el menor que sea >= el diámetro de la
+# búsqueda, así una búsqueda cubre como mucho 2 x 2 teselas
+NIVELES_KM = (0.5, 1, 2, 4, 8, 16, 32)
+
+# Latitud de referencia para pasar km a grados de longitud (Baleares)
+LATITUD_REFERENCIA = 39.5
+
+# Radio máximo que admite Places Nearby Search
+RADIO_MAXIMO_PLACES_KM = 50
+
+
+class CacheLugares:
+    """
+    buscar(lat, lon, tipo_lugar, radio_km) -> lista de lugares o None si falla.
+    Cada lugar es un dict con al menos 'lat', 'lon' y 'place_id'.
+    """
+
+    def __init__(self, buscar, ttl=86400, max_teselas=2000, max_workers=4, max_frias=4):
+        self._buscar = buscar
+        self.ttl = ttl
+        self.max_teselas = max_teselas
+        # Más teselas por cargar que esto (radios mayores que el nivel más
+        # grande) y la búsqueda se hace directamente, sin caché
+        self.max_frias = max_frias
+        self._teselas = OrderedDict()  # (tipo, nivel, ty, tx) -> (cargada_en, lugares)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='places')
+        self._stats = {
+            'hits': 0, 'misses': 0, 'errors': 0, 'evictions': 0, 'expired': 0, 'directas': 0,
+        }
+
+    @staticmethod
+    def _nivel(radio_km):
+        for lado in NIVELES_KM:
+            if lado >= 2 * radio_km:
+                return lado
+        return NIVELES_KM[-1]
+
+    @staticmethod
+    def _grados(lado_km):
+        dlat = lado_km / KM_POR_GRADO
+        dlon = lado_km / (KM_POR_GRADO * math.cos(math.radians(LATITUD_REFERENCIA)))
+        return dlat, dlon
+
+    def _teselas_para(self, lat, lon, radio_km):
+        lado = self._nivel(radio_km)
+        dlat, dlon = self._grados(lado)
+        rlat, rlon = self._grados(radio_km)
+        ty0, ty1 = math.floor((lat - rlat) / dlat), math.floor((lat + rlat) / dlat)
+        tx0, tx1 = math.floor((lon - rlon) / dlon), math.floor((lon + rlon) / dlon)
+        return lado, [(ty, tx) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+    def _cargar_tesela(self, tipo_lugar, lado, ty, tx):
+        """Consulta Places con un círculo que cubre toda la tesela."""
+        dlat, dlon = self._grados(lado)
+        centro_lat = (ty + 0.5) * dlat
+        centro_lon = (tx + 0.5) * dlon
+        radio = min(lado * math.sqrt(2) / 2, RADIO_MAXIMO_PLACES_KM)
+        lugares = self._buscar(centro_lat, centro_lon, tipo_lugar, radio)
+        if lugares is None:
+            return None
+        # Solo los que caen dentro de la tesela (el círculo se sale por los lados)
+        return [
+            lugar for lugar in lugares
+            if math.floor(lugar['lat'] / dlat) == ty and math.floor(lugar['lon'] / dlon) == tx
+        ]
+
+    def buscar(self, lat, lon, tipo_lugar, radio_km):
+        """Lugares del tipo a menos de radio_km, con distancia_km y ordenados."""
+        lado, teselas = self._teselas_para(lat, lon, radio_km)
+        ahora = time.time()
+        lugares = []
+        faltan = []
+        with self._lock:
+            for ty, tx in teselas:
+                clave = (tipo_lugar, lado, ty, tx)
+                entrada = self._teselas.get(clave)
+                if entrada is not None and ahora - entrada[0] >= self.ttl:
+                    del self._teselas[clave]
+                    self._stats['expired'] += 1
+                    entrada = None
+                if entrada is None:
+                    faltan.append((ty, tx))
+                    self._stats['misses'] += 1
+                else:
+                    self._teselas.move_to_end(clave)
+                    lugares.extend(entrada[1])
+                    self._stats['hits'] += 1
+            if len(faltan) > self.max_frias:
+                self._stats['directas'] += 1
+
+        if len(faltan) > self.max_frias:
+            directos = self._buscar(lat, lon, tipo_lugar, min(radio_km, RADIO_MAXIMO_PLACES_KM))
+            return self._ordenar(lat, lon, radio_km, directos or [])
+
+        # Las teselas que faltan se piden a Places en paralelo
+        futuros = [
+            ((ty, tx), self._executor.submit(self._cargar_tesela, tipo_lugar, lado, ty, tx))
+            for ty, tx in faltan
+        ]
+        for (ty, tx), futuro in futuros:
+            try:
+                cargados = futuro.result()
+            except Exception as e:
+                print(f"Error cargando tesela de lugares {tipo_lugar} {ty},{tx}: {e}")
+                cargados = None
+            if cargados is None:
+                with self._lock:
+                    self._stats['errors'] += 1
+                continue
+            lugares.extend(cargados)
+            with self._lock:
+                self._teselas[(tipo_lugar, lado, ty, tx)] = (time.time(), cargados)
+                while len(self._teselas) > self.max_teselas:
+                    self._teselas.popitem(last=False)
+                    self._stats['evictions'] += 1
+
+        return self._ordenar(lat, lon, radio_km, lugares)
+
+    @staticmethod
+    def _ordenar(lat, lon, radio_km, lugares):
+        """Sin duplicados, dentro del radio, con distancia_km y ordenados por distancia."""
+        unicos = list({lugar['place_id'] or id(lugar): lugar for lugar in lugares}.values())
+        if not unicos:
+            return []
+        distancias = distancias_a_punto(
+            lat, lon, [l['lat'] for l in unicos], [l['lon'] for l in unicos]
+        )
+        resultado = []
+        for lugar, distancia in zip(unicos, distancias):
+            if distancia <= radio_km:
+                resultado.append({**lugar, 'distancia_km': float(distancia)})
+        resultado.sort(key=lambda x: x['distancia_km'])
+        return resultado
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'teselas': len(self._teselas),
+                'max_teselas': self.max_teselas,
+                'max_frias': self.max_frias,
+                **self._stats,
+            }
+
+
+def crear_cache(buscar):
+    """Caché con la configuración de las variables de entorno PLACES_CACHE_*."""
+    return CacheLugares(
+        buscar,
+        ttl=int(os.getenv('PLACES_CACHE_TTL', '86400')),
+        max_teselas=int(os.getenv('PLACES_CACHE_MAX_TILES', '2000')),
+        max_frias=int(os.getenv('PLACES_CACHE_MAX_COLD_TILES', '4')),
+    )
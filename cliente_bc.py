@@ -0,0 +1,154 @@
+"""
+Cliente HTTP compartido para las llamadas OData a Business Central.
+
+Antes cada llamada hacía un requests.get/post suelto: conexión TCP+TLS
+nueva y, con NTLM, el intercambio de autenticación completo (401, negociar,
+desafío) en cada petición. ClienteBC mantiene una sola requests.Session
+para toda la aplicación:
+
+- HTTPAdapter con un pool de conexiones keep-alive (`pool_maxsize`), que
+  comparten todos los hilos de waitress
+- La autenticación (Bearer, NTLM o Basic) se prepara una vez; NTLM
+  autentica la conexión, así que mientras se reutiliza no se repite el
+  intercambio
+- Timeouts (conexión, lectura) por endpoint
+- Estadísticas por endpoint (llamadas, errores, latencia) y de conexiones
+  creadas y autenticaciones NTLM, para /api/stats
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.bc_incidencias import BC_CONFIG, get_bc_auth_credentials, get_bc_auth_header
+
+
+class ClienteBC:
+    """
+    Sesión HTTP compartida y thread-safe con Business Central.
+
+    Args:
+        timeouts: {endpoint: segundos de lectura}; los endpoints sin
+            entrada usan `timeout_defecto`
+        timeout_conexion: segundos para establecer la conexión
+        pool_maxsize: conexiones keep-alive que se mantienen abiertas
+    """
+
+    def __init__(self, timeouts=None, timeout_defecto=120, timeout_conexion=10, pool_maxsize=8):
+        self.timeouts = dict(timeouts or {})
+        self.timeout_defecto = timeout_defecto
+        self.timeout_conexion = timeout_conexion
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._adapter = None
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._stats = {'autenticaciones_ntlm': 0, 'errores_conexion': 0}
+
+    def _sesion(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_maxsize)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers['Accept'] = 'application/json'
+                    auth_header = get_bc_auth_header()
+                    if auth_header:
+                        session.headers['Authorization'] = auth_header
+                    else:
+                        session.auth = get_bc_auth_credentials()
+                    self._adapter = adapter
+                    self._session = session
+        return self._session
+
+    def _timeout(self, endpoint, timeout):
+        lectura = timeout if timeout is not None else self.timeouts.get(endpoint, self.timeout_defecto)
+        return self.timeout_conexion, lectura
+
+    def request(self, metodo, url, endpoint, timeout=None, **kwargs):
+        """
+        Petición a BC por la sesión compartida. `endpoint` es el nombre con
+        el que se agrupan las estadísticas y se elige el timeout.
+        """
+        inicio = time.perf_counter()
+        respuesta = None
+        try:
+            respuesta = self._sesion().request(metodo, url, timeout=self._timeout(endpoint, timeout), **kwargs)
+            return respuesta
+        except requests.ConnectionError:
+            with self._lock:
+                self._stats['errores_conexion'] += 1
+            raise
+        finally:
+            self._registrar(endpoint, time.perf_counter() - inicio, respuesta)
+
+    def get(self, url, endpoint, **kwargs):
+        return self.request('GET', url, endpoint, **kwargs)
+
+    def post(self, url, endpoint, **kwargs):
+        return self.request('POST', url, endpoint, **kwargs)
+
+    def _registrar(self, endpoint, segundos, respuesta):
+        ms = segundos * 1000.0
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'llamadas': 0, 'errores': 0, 'ms_total': 0.0, 'ms_max': 0.0, 'ms_ultima': 0.0,
+            })
+            stats['llamadas'] += 1
+            stats['ms_total'] += ms
+            stats['ms_max'] = max(stats['ms_max'], ms)
+            stats['ms_ultima'] = ms
+            if respuesta is None or respuesta.status_code >= 400:
+                stats['errores'] += 1
+            # requests_ntlm reintenta tras el 401 del servidor: el 401 queda en history
+            if respuesta is not None and any(r.status_code == 401 for r in respuesta.history):
+                self._stats['autenticaciones_ntlm'] += 1
+
+    def _conexiones_creadas(self):
+        """Conexiones (handshakes TCP/TLS) que han abierto los pools de urllib3 activos."""
+        if self._adapter is None:
+            return 0
+        pools = self._adapter.poolmanager.pools
+        total = 0
+        for clave in list(pools.keys()):
+            pool = pools.get(clave)
+            if pool is not None:
+                total += pool.num_connections
+        return total
+
+    def stats(self):
+        with self._lock:
+            endpoints = {
+                nombre: {
+                    'llamadas': s['llamadas'],
+                    'errores': s['errores'],
+                    'ms_medio': round(s['ms_total'] / s['llamadas'], 1) if s['llamadas'] else None,
+                    'ms_max': round(s['ms_max'], 1),
+                    'ms_ultima': round(s['ms_ultima'], 1),
+                }
+                for nombre, s in self._endpoints.items()
+            }
+            llamadas = sum(s['llamadas'] for s in self._endpoints.values())
+            stats = dict(self._stats)
+        conexiones = self._conexiones_creadas()
+        return {
+            'pool_maxsize': self.pool_maxsize,
+            'timeout_conexion': self.timeout_conexion,
+            'timeouts': {**self.timeouts, 'defecto': self.timeout_defecto},
+            'llamadas': llamadas,
+            'conexiones_creadas': conexiones,
+            'llamadas_por_conexion': round(llamadas / conexiones, 1) if conexiones else None,
+            **stats,
+            'endpoints': endpoints,
+        }
+
+
+cliente = ClienteBC(
+    timeouts=BC_CONFIG.get('timeouts'),
+    timeout_defecto=BC_CONFIG.get('timeout', 120),
+    timeout_conexion=BC_CONFIG.get('connect_timeout', 10),
+    pool_maxsize=BC_CONFIG.get('pool_maxsize', 8),
+)
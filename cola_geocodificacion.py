@@ -0,0 +1,210 @@
+"""
+Cola de geocodificación en segundo plano para el mobiliario sin coordenadas.
+
+GET /api/mobiliario ya no geocodifica dentro de la petición: encola los
+emplazamientos sin coordenadas y responde al momento con
+geocodificado='pending'. Unos pocos hilos de trabajo resuelven las
+direcciones y guardan los resultados en la BD por lotes (y en los
+snapshots cargados), así que la siguiente carga del mapa ya recibe las
+coordenadas.
+
+- Cada emplazamiento se encola una sola vez mientras está pendiente
+- Concurrencia acotada (número fijo de hilos) y tamaño máximo de cola
+- Las coordenadas se escriben en lotes de hasta `lote` emplazamientos, o
+  antes si la cola se queda vacía
+- Los emplazamientos que no se pueden geocodificar no se reintentan hasta
+  pasado `reintentar_tras` segundos
+- Cada resultado se publica (resultado()) en cuanto se geocodifica, sin
+  esperar a que se escriba su lote
+- Los emplazamientos guardados en la BD se olvidan (sus coordenadas ya están
+  en los snapshots); del resto se recuerdan como mucho `max_en_memoria`,
+  expulsando los más antiguos
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+PENDIENTE = 'pending'
+RESUELTO = 'ok'
+FALLIDO = 'failed'
+
+
+class ColaGeocodificacion:
+    """
+    Cola deduplicada por emplazamiento con `max_workers` hilos.
+
+    geocodificar(emplazamiento, descripcion, direccion) -> (lat, lon) o (None, None)
+    guardar([(emplazamiento, lat, lon), ...]) -> {emplazamiento: bool (escrito en la BD)}
+    """
+
+    def __init__(self, geocodificar, guardar, max_workers=2, max_pendientes=5000,
+                 reintentar_tras=3600, lote=50, max_en_memoria=20000):
+        self._geocodificar = geocodificar
+        self._guardar = guardar
+        self.max_workers = max_workers
+        self.reintentar_tras = reintentar_tras
+        self.lote = lote
+        self.max_en_memoria = max_en_memoria
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._estados = OrderedDict()     # emplazamiento -> (estado, instante), el más antiguo primero
+        self._resultados = OrderedDict()  # emplazamiento -> (lat, lon, guardado en BD)
+        self._por_guardar = []  # (emplazamiento, lat, lon) resueltos sin escribir aún
+        self._workers = []
+        self._lock = threading.Lock()
+        # Cambia cada vez que cambia el estado de algún emplazamiento (ETags)
+        self.version = 0
+        self._stats = {
+            'encolados': 0,
+            'duplicados': 0,
+            'descartados': 0,
+            'resueltos': 0,
+            'fallidos': 0,
+            'errores_guardado': 0,
+            'lotes_guardados': 0,
+            'olvidados': 0,
+        }
+
+    def _poner_estado(self, clave, estado, instante):
+        """Actualiza el estado y expulsa los más antiguos si se pasa de max_en_memoria. Con el lock tomado."""
+        self._estados[clave] = (estado, instante)
+        self._estados.move_to_end(clave)
+        # Los pendientes no se expulsan (se volverían a encolar); ya los limita la cola
+        revisados = 0
+        while len(self._estados) > self.max_en_memoria and revisados < len(self._estados):
+            antigua, (estado_antiguo, _) = next(iter(self._estados.items()))
+            revisados += 1
+            if estado_antiguo == PENDIENTE:
+                self._estados.move_to_end(antigua)
+                continue
+            del self._estados[antigua]
+            self._resultados.pop(antigua, None)
+            self._stats['olvidados'] += 1
+
+    def _arrancar_workers(self):
+        # Los hilos se crean la primera vez que hay trabajo
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._trabajar,
+                name=f"geocodificacion-{len(self._workers) + 1}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def encolar(self, emplazamiento, descripcion, direccion):
+        """
+        Encola un emplazamiento si no está ya pendiente. Devuelve su estado:
+        PENDIENTE, RESUELTO o FALLIDO.
+        """
+        clave = str(emplazamiento).strip()
+        with self._lock:
+            estado = self._estados.get(clave)
+            if estado is not None:
+                if estado[0] == FALLIDO and time.time() - estado[1] >= self.reintentar_tras:
+                    estado = None
+                else:
+                    self._stats['duplicados'] += 1
+                    return estado[0]
+            try:
+                self._cola.put_nowait((clave, descripcion, direccion))
+            except queue.Full:
+                self._stats['descartados'] += 1
+                return FALLIDO
+            self._poner_estado(clave, PENDIENTE, time.time())
+            self._stats['encolados'] += 1
+            self.version += 1
+            self._arrancar_workers()
+        return PENDIENTE
+
+    def resultado(self, emplazamiento):
+        """(lat, lon, guardado) si el emplazamiento ya se geocodificó, si no None."""
+        with self._lock:
+            return self._resultados.get(str(emplazamiento).strip())
+
+    def _trabajar(self):
+        while True:
+            clave, descripcion, direccion = self._cola.get()
+            try:
+                self._procesar(clave, descripcion, direccion)
+            except Exception as e:
+                print(f"Error geocodificando emplazamiento {clave} en segundo plano: {e}")
+                with self._lock:
+                    self._poner_estado(clave, FALLIDO, time.time())
+                    self._stats['fallidos'] += 1
+                    self.version += 1
+            try:
+                self._guardar_pendientes(forzar=self._cola.empty())
+            finally:
+                self._cola.task_done()
+
+    def _procesar(self, clave, descripcion, direccion):
+        lat, lon = self._geocodificar(clave, descripcion, direccion)
+        with self._lock:
+            self.version += 1
+            if not lat or not lon:
+                self._poner_estado(clave, FALLIDO, time.time())
+                self._stats['fallidos'] += 1
+            else:
+                # Visible ya para resultado(); la escritura en BD va por lotes
+                self._resultados[clave] = (lat, lon, False)
+                self._poner_estado(clave, RESUELTO, time.time())
+                self._stats['resueltos'] += 1
+                self._por_guardar.append((clave, lat, lon))
+
+    def _guardar_pendientes(self, forzar=False):
+        """Escribe un lote de coordenadas resueltas (si está lleno o `forzar`)."""
+        with self._lock:
+            if not self._por_guardar or (len(self._por_guardar) < self.lote and not forzar):
+                return
+            lote, self._por_guardar = self._por_guardar[:self.lote], self._por_guardar[self.lote:]
+
+        try:
+            guardados = self._guardar(lote) or {}
+        except Exception as e:
+            print(f"Error guardando un lote de {len(lote)} coordenadas: {e}")
+            guardados = {}
+
+        with self._lock:
+            self._stats['lotes_guardados'] += 1
+            self.version += 1
+            for clave, lat, lon in lote:
+                if guardados.get(clave):
+                    # Ya está en la BD y en los snapshots cargados: no hace falta recordarlo
+                    self._resultados.pop(clave, None)
+                    self._estados.pop(clave, None)
+                else:
+                    self._stats['errores_guardado'] += 1
+        if forzar:
+            # Puede quedar más de un lote acumulado
+            self._guardar_pendientes(forzar=True)
+
+    def esperar(self):
+        """Bloquea hasta que la cola se vacía (útil en scripts y pruebas)."""
+        self._cola.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'workers': len(self._workers),
+                'pendientes': self._cola.qsize(),
+                'por_guardar': len(self._por_guardar),
+                'en_memoria': len(self._estados),
+                'max_en_memoria': self.max_en_memoria,
+                **self._stats,
+            }
+
+
+def crear_cola(geocodificar, guardar):
+    """Cola con la configuración de las variables de entorno GEOCODING_QUEUE_*."""
+    return ColaGeocodificacion(
+        geocodificar,
+        guardar,
+        max_workers=int(os.getenv('GEOCODING_QUEUE_WORKERS', '2')),
+        max_pendientes=int(os.getenv('GEOCODING_QUEUE_MAX', '5000')),
+        reintentar_tras=int(os.getenv('GEOCODING_QUEUE_RETRY_AFTER', '3600')),
+        lote=int(os.getenv('GEOCODING_QUEUE_BATCH', '50')),
+        max_en_memoria=int(os.getenv('GEOCODING_QUEUE_MAX_MEMORY', '20000')),
+    )
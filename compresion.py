@@ -0,0 +1,205 @@
+"""
+Compresión de las respuestas (gzip y brotli si está instalado).
+
+Waitress no comprime y detrás de HttpPlatformHandler las respuestas JSON
+de marcadores salían tal cual. Se comprime en un after_request según
+Accept-Encoding:
+
+- Solo tipos de texto/JSON (y teselas MVT) y por encima de `tamano_minimo`
+  bytes; los 304, los ficheros (send_file) y lo que ya viene comprimido
+  no se tocan
+- Niveles bajos por defecto (gzip 5, brotli 4): en estas respuestas tan
+  repetitivas se gana casi todo el tamaño sin que la compresión añada
+  latencia apreciable
+- Las respuestas con ETag (ver etags.py) se guardan ya comprimidas por
+  (ETag, codificación), así que repetir la misma petición no vuelve a
+  comprimir; el ETag pasa a débil porque el cuerpo enviado cambia
+- Las respuestas en streaming se comprimen con gzip bloque a bloque
+"""
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se ofrece gzip
+    brotli = None
+
+# Tipos MIME que merece la pena comprimir
+TIPOS_COMPRIMIBLES = {
+    'application/json',
+    'application/geo+json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/vnd.mapbox-vector-tile',
+    'image/svg+xml',
+}
+
+
+def _gzip(datos, nivel):
+    comp = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    return comp.compress(datos) + comp.flush()
+
+
+def _gzip_stream(bloques, nivel):
+    """Comprime un iterable de bytes sin esperar al final (flush por bloque)."""
+    comp = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = comp.compress(bloque) + comp.flush(zlib.Z_SYNC_FLUSH)
+        if datos:
+            yield datos
+    yield comp.flush()
+
+
+class Compresion:
+    """
+    Middleware de compresión para una app Flask.
+
+    La caché de cuerpos comprimidos es LRU y está limitada en bytes
+    (`max_bytes_cache`); 0 la desactiva.
+    """
+
+    def __init__(self, app=None, tamano_minimo=1024, nivel_gzip=5, calidad_brotli=4,
+                 max_bytes_cache=64 * 1024 * 1024):
+        self.tamano_minimo = tamano_minimo
+        self.nivel_gzip = nivel_gzip
+        self.calidad_brotli = calidad_brotli
+        self.max_bytes_cache = max_bytes_cache
+        self._cache = OrderedDict()  # (etag, codificación) -> bytes comprimidos
+        self._bytes_cache = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'comprimidas': 0,
+            'streaming': 0,
+            'cache_hits': 0,
+            'sin_comprimir': 0,
+            'bytes_originales': 0,
+            'bytes_comprimidos': 0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self._despues_de_peticion)
+
+    def _codificaciones(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def _comprimir(self, datos, codificacion):
+        if codificacion == 'br':
+            return brotli.compress(datos, quality=self.calidad_brotli)
+        return _gzip(datos, self.nivel_gzip)
+
+    def _comprimir_con_cache(self, datos, codificacion, etag):
+        if etag is None or not self.max_bytes_cache:
+            return self._comprimir(datos, codificacion)
+        clave = (etag, codificacion)
+        with self._lock:
+            comprimido = self._cache.get(clave)
+            if comprimido is not None:
+                self._cache.move_to_end(clave)
+                self._stats['cache_hits'] += 1
+                return comprimido
+
+        comprimido = self._comprimir(datos, codificacion)
+        if len(comprimido) <= self.max_bytes_cache:
+            with self._lock:
+                if clave not in self._cache:
+                    self._cache[clave] = comprimido
+                    self._bytes_cache += len(comprimido)
+                while self._bytes_cache > self.max_bytes_cache:
+                    _, expulsado = self._cache.popitem(last=False)
+                    self._bytes_cache -= len(expulsado)
+        return comprimido
+
+    @staticmethod
+    def _comprimible(response):
+        mimetype = response.mimetype or ''
+        return mimetype in TIPOS_COMPRIMIBLES or mimetype.startswith('text/')
+
+    def _despues_de_peticion(self, response):
+        if response.status_code == 304:
+            # El 304 lleva el mismo ETag que llevaría la respuesta comprimida
+            response.vary.add('Accept-Encoding')
+            if request.accept_encodings.best_match(self._codificaciones()) is not None:
+                self._marcar_etag_debil(response)
+            return response
+
+        comprimible = self._comprimible(response)
+        if comprimible:
+            response.vary.add('Accept-Encoding')
+
+        if (
+            not comprimible
+            or response.status_code != 200
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')
+        ):
+            return response
+
+        if response.is_streamed:
+            # Tamaño desconocido: se comprime con gzip a medida que se genera
+            if request.accept_encodings.best_match(('gzip',)) is None:
+                return response
+            response.response = _gzip_stream(response.iter_encoded(), self.nivel_gzip)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = 'gzip'
+            self._marcar_etag_debil(response)
+            with self._lock:
+                self._stats['streaming'] += 1
+            return response
+
+        codificacion = request.accept_encodings.best_match(self._codificaciones())
+        if codificacion is None:
+            return response
+
+        datos = response.get_data()
+        if len(datos) < self.tamano_minimo:
+            with self._lock:
+                self._stats['sin_comprimir'] += 1
+            return response
+
+        etag, _ = response.get_etag()
+        comprimido = self._comprimir_con_cache(datos, codificacion, etag)
+        response.set_data(comprimido)
+        response.headers['Content-Encoding'] = codificacion
+        self._marcar_etag_debil(response)
+        with self._lock:
+            self._stats['comprimidas'] += 1
+            self._stats['bytes_originales'] += len(datos)
+            self._stats['bytes_comprimidos'] += len(comprimido)
+        return response
+
+    @staticmethod
+    def _marcar_etag_debil(response):
+        etag, debil = response.get_etag()
+        if etag is not None and not debil:
+            response.set_etag(etag, weak=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'codificaciones': list(self._codificaciones()),
+                'tamano_minimo': self.tamano_minimo,
+                'nivel_gzip': self.nivel_gzip,
+                'calidad_brotli': self.calidad_brotli if brotli is not None else None,
+                'cache_entradas': len(self._cache),
+                'cache_bytes': self._bytes_cache,
+                'max_bytes_cache': self.max_bytes_cache,
+                **self._stats,
+            }
+
+
+def crear_compresion(app):
+    """Compresión con la configuración de las variables de entorno COMPRESSION_*."""
+    return Compresion(
+        app,
+        tamano_minimo=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        nivel_gzip=int(os.getenv('COMPRESSION_GZIP_LEVEL', '5')),
+        calidad_brotli=int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4')),
+        max_bytes_cache=int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    )
@@ -40,6 +40,23 @@ SEARCH_CONFIG = {
         'lon_min': 1.10,
         'lon_max': 4.42,
     },
+    # Geocodificación de emplazamientos: los primeros proveedores en paralelo
+    # ("carrera"). Se acepta el primer resultado válido en Baleares por orden
+    # de prioridad; cada proveedor tiene un presupuesto de segundos y hay un
+    # plazo total. Los demás (Bing, Nominatim) solo se prueban uno tras otro
+    # si la carrera no encuentra nada. Nominatim nunca entra en la carrera
+    # (política de uso de 1 petición por segundo).
+    'carrera': {
+        'enabled': True,
+        'proveedores': ('google_maps', 'photon'),
+        'workers': 8,
+        'deadline': 12,
+        'budgets': {
+            'google_maps': 5,
+            'photon': 5,
+            'bing_maps': 6,
+        },
+    },
     'baleares_admin_area': 'Illes Balears',
     'baleares_terms': (
         'balear', 'illes balears', 'islas baleares', 'balearic',
@@ -32,12 +32,25 @@ BC_CONFIG = {
     "endpoint_lista_incidencias": os.getenv(
         "BUSINESS_CENTRAL_ENDPOINT_LISTA_INCIDENCIAS", "ListaIncidencias"
     ),
+    # Campo de ListaIncidencias con el id del usuario GTask
+    "campo_usuario_gtask": os.getenv(
+        "BUSINESS_CENTRAL_CAMPO_USUARIO_GTASK", "Id_Uduario_Gtask"
+    ),
     "company": BUSINESS_CENTRAL_COMPANY,
     "credentials": {
         "username": BUSINESS_CENTRAL_USERNAME,
         "password": BUSINESS_CENTRAL_PASSWORD,
     },
     "timeout": int(os.getenv("BUSINESS_CENTRAL_TIMEOUT", "120")),
+    # Timeouts de lectura por endpoint (segundos) y de conexión del cliente compartido
+    "timeouts": {
+        "lista_incidencias": int(os.getenv("BUSINESS_CENTRAL_TIMEOUT_LISTA", "60")),
+        "lista_incidencias_usuario": int(os.getenv("BUSINESS_CENTRAL_TIMEOUT_LISTA_USUARIO", os.getenv("BUSINESS_CENTRAL_TIMEOUT_LISTA", "60"))),
+        "incidencia_gtask": int(os.getenv("BUSINESS_CENTRAL_TIMEOUT_GTASK", os.getenv("BUSINESS_CENTRAL_TIMEOUT", "120"))),
+    },
+    "connect_timeout": int(os.getenv("BUSINESS_CENTRAL_CONNECT_TIMEOUT", "10")),
+    # Conexiones keep-alive con BC que se mantienen abiertas
+    "pool_maxsize": int(os.getenv("BUSINESS_CENTRAL_POOL_MAXSIZE", "8")),
 }
 
 INCIDENCIAS_URL = os.getenv("INCIDENCIAS_URL", "https://incidencias.malla.es").rstrip("/")
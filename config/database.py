@@ -4,25 +4,24 @@ Configuración de conexión a la base de datos SQL Server
 
 import pyodbc
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from typing import Optional
 
-def get_db_connection() -> pyodbc.Connection:
-    """
-    Establece conexión con la base de datos SQL Server
-    
-    Returns:
-        pyodbc.Connection: Conexión a la base de datos
-    """
-    
+
+def _build_connection_string() -> str:
+    """Construye la cadena de conexión a partir de las variables de entorno"""
     # Configuración de la base de datos (ajustar según tu entorno)
     server = os.getenv('DB_SERVER', '192.168.10.190')
     database = os.getenv('DB_NAME', 'Malla2009')
     username = os.getenv('DB_USER', 'SA')
     password = os.getenv('DB_PASSWORD', 'SA1234sa')
     driver = os.getenv('DB_DRIVER', 'ODBC Driver 17 for SQL Server')
-    
+
     # Cadena de conexión
-    connection_string = f"""
+    return f"""
     DRIVER={{{driver}}};
     SERVER={server};
     DATABASE={database};
@@ -30,28 +29,292 @@ def get_db_connection() -> pyodbc.Connection:
     PWD={password};
     Trusted_Connection=no;
     """
-    
+
+
+def _open_raw_connection() -> pyodbc.Connection:
+    """Abre una conexión nueva (sin pool) a SQL Server"""
     try:
-        conn = pyodbc.connect(connection_string)
-        return conn
+        return pyodbc.connect(_build_connection_string())
     except pyodbc.Error as e:
         print(f"Error al conectar con la base de datos: {e}")
         raise
 
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión pyodbc prestada por el pool.
+
+    Se comporta como la conexión original (cursor, commit, rollback...),
+    pero close() la devuelve al pool en lugar de cerrarla. Al devolverla se
+    hace rollback, así que los cambios deben confirmarse con commit().
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._returned = False
+
+    def __getattr__(self, name):
+        if self._returned:
+            raise pyodbc.ProgrammingError("La conexión ya se ha devuelto al pool")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self._raw, self._created_at)
+
+    def invalidate(self):
+        """Descarta la conexión (no vuelve al pool)."""
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self._raw, self._created_at, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and isinstance(exc, pyodbc.Error):
+            self.invalidate()
+        else:
+            self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQL Server thread-safe.
+
+    - Tamaño máximo acotado (las peticiones esperan si está agotado)
+    - Comprobación de salud (SELECT 1) al prestar conexiones que llevan tiempo ociosas
+    - Vida máxima por conexión (se recicla al superarla)
+    - Rollback al devolverla para no arrastrar transacciones abiertas
+    """
+
+    def __init__(self, connect=None, max_size=8, max_lifetime=1800,
+                 health_check_after=30, acquire_timeout=30):
+        self._connect = connect or _open_raw_connection
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()  # (raw, created_at, last_used)
+        self._in_use = 0
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def _total(self):
+        return len(self._idle) + self._in_use
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Presta una conexión del pool (o abre una nueva si hay hueco)."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                while not self._idle and self._total() >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise TimeoutError(
+                            f"Pool de conexiones agotado ({self.max_size} en uso)"
+                        )
+                    self._stats['waits'] += 1
+                    self._lock.wait(remaining)
+
+                if self._idle:
+                    raw, created_at, last_used = self._idle.pop()
+                else:
+                    raw, created_at, last_used = None, None, None
+                self._in_use += 1
+
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._in_use -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._stats['created'] += 1
+                return PooledConnection(self, raw, time.monotonic())
+
+            now = time.monotonic()
+            if now - created_at > self.max_lifetime:
+                self._close_raw(raw)
+                with self._lock:
+                    self._in_use -= 1
+                    self._stats['recycled'] += 1
+                continue
+
+            if now - last_used > self.health_check_after and not self._is_healthy(raw):
+                self._close_raw(raw)
+                with self._lock:
+                    self._in_use -= 1
+                    self._stats['health_check_failures'] += 1
+                continue
+
+            with self._lock:
+                self._stats['reused'] += 1
+            return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at, discard=False):
+        if not discard:
+            try:
+                raw.rollback()
+            except Exception:
+                discard = True
+        if not discard and time.monotonic() - created_at > self.max_lifetime:
+            discard = True
+
+        if discard:
+            self._close_raw(raw)
+        with self._lock:
+            self._in_use -= 1
+            if discard:
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append((raw, created_at, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager: presta una conexión y la devuelve al salir."""
+        conn = self.acquire()
+        with conn:
+            yield conn
+
+    def warm(self, size: Optional[int] = None) -> int:
+        """Abre conexiones por adelantado hasta `size` (por defecto max_size)."""
+        size = min(self.max_size, size if size is not None else self.max_size)
+        conns = []
+        try:
+            while True:
+                with self._lock:
+                    if self._total() >= size:
+                        break
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                conn.close()
+        return len(conns)
+
+    def close_all(self):
+        """Cierra las conexiones ociosas (las prestadas se cierran al devolverse)."""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _, _ in idle:
+            self._close_raw(raw)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_lifetime': self.max_lifetime,
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Devuelve el pool global (se crea la primera vez)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    max_size=int(os.getenv('DB_POOL_SIZE', '8')),
+                    max_lifetime=int(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+                    health_check_after=int(os.getenv('DB_POOL_HEALTH_CHECK', '30')),
+                    acquire_timeout=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+                )
+    return _pool
+
+
+def get_db_connection() -> PooledConnection:
+    """
+    Obtiene una conexión del pool de SQL Server
+
+    Llamar a close() sobre la conexión la devuelve al pool.
+
+    Returns:
+        PooledConnection: Conexión a la base de datos
+    """
+    return get_pool().acquire()
+
+
+def db_connection():
+    """
+    Context manager para usar una conexión del pool:
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            ...
+    """
+    return get_pool().connection()
+
+
+def warm_pool(size: Optional[int] = None) -> int:
+    """Precalienta el pool (usado al arrancar wsgi.py)"""
+    if size is None:
+        size = int(os.getenv('DB_POOL_WARM', '4'))
+    return get_pool().warm(size)
+
+
+def pool_stats() -> dict:
+    """Estadísticas del pool de conexiones"""
+    return get_pool().stats()
+
+
 def test_connection() -> bool:
     """
     Prueba la conexión a la base de datos
-    
+
     Returns:
         bool: True si la conexión es exitosa, False en caso contrario
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
         return True
     except Exception as e:
         print(f"Error en la prueba de conexión: {e}")
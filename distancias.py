@@ -0,0 +1,70 @@
+"""
+Cálculo de distancias haversine en lote con NumPy.
+
+Las búsquedas "cerca" calculan la distancia de muchas filas a uno o varios
+puntos de referencia; aquí se hace con operaciones vectorizadas en lugar de
+un bucle de llamadas a math. Para un único par de puntos se usa la versión
+escalar, que es más rápida que crear arrays.
+"""
+import math
+
+import numpy as np
+
+# Radio de la Tierra en kilómetros
+RADIO_TIERRA_KM = 6371.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distancia en km entre dos puntos (versión escalar)."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2) - math.radians(lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return RADIO_TIERRA_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _a_radianes(valores):
+    return np.radians(np.asarray(valores, dtype=float))
+
+
+def _haversine_rad(lat1, lon1, lat2, lon2):
+    """Haversine sobre arrays en radianes (admite broadcasting)."""
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return RADIO_TIERRA_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distancias_a_punto(lat, lon, lats, lons):
+    """Array con la distancia en km de cada (lats[i], lons[i]) a (lat, lon)."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if lats.size == 1:
+        return np.array([haversine(lat, lon, float(lats[0]), float(lons[0]))])
+    return _haversine_rad(math.radians(lat), math.radians(lon), np.radians(lats), np.radians(lons))
+
+
+def matriz_distancias(lats_a, lons_a, lats_b, lons_b):
+    """Matriz (len(a) x len(b)) de distancias en km entre dos conjuntos de puntos."""
+    lats_a = _a_radianes(lats_a)[:, np.newaxis]
+    lons_a = _a_radianes(lons_a)[:, np.newaxis]
+    lats_b = _a_radianes(lats_b)[np.newaxis, :]
+    lons_b = _a_radianes(lons_b)[np.newaxis, :]
+    return _haversine_rad(lats_a, lons_a, lats_b, lons_b)
+
+
+def mas_cercano(lats, lons, puntos):
+    """
+    Para cada (lats[i], lons[i]) devuelve el índice del punto de `puntos`
+    [(lat, lon), ...] más cercano y la distancia a él, como dos arrays.
+    """
+    if len(puntos) == 1:
+        lat, lon = puntos[0]
+        return np.zeros(len(lats), dtype=int), distancias_a_punto(lat, lon, lats, lons)
+    puntos_lat = [p[0] for p in puntos]
+    puntos_lon = [p[1] for p in puntos]
+    matriz = matriz_distancias(lats, lons, puntos_lat, puntos_lon)
+    indices = matriz.argmin(axis=1)
+    return indices, matriz[np.arange(len(indices)), indices]
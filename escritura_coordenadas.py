@@ -0,0 +1,91 @@
+"""
+Escritura en lote de coordenadas de emplazamientos en SQL Server.
+
+En lugar de un COUNT(*) + UPDATE por emplazamiento, las coordenadas se
+cargan en una tabla temporal con fast_executemany y se aplican con un único
+UPDATE ... JOIN. El OUTPUT del UPDATE dice qué emplazamientos existían, así
+que se informa del resultado de cada fila.
+"""
+
+TABLA_EMPLAZAMIENTOS = '[Malla Publicidad$Emplazamientos$4c3e28b8-7fe9-4a33-ad5d-d26cbf8f7765]'
+
+ACTUALIZADO = 'actualizado'
+NO_ENCONTRADO = 'no_encontrado'
+COORDENADAS_INVALIDAS = 'coordenadas_invalidas'
+
+
+def _coordenadas_validas(lat, lon):
+    try:
+        return bool(lat) and bool(lon) and -90 <= float(lat) <= 90 and -180 <= float(lon) <= 180
+    except (TypeError, ValueError):
+        return False
+
+
+def actualizar_coordenadas_lote(cursor, coordenadas):
+    """
+    Actualiza PuntoX/PuntoY de muchos emplazamientos en un solo viaje.
+
+    Args:
+        cursor: Cursor de la base de datos (el commit lo hace quien llama)
+        coordenadas: iterable de (emplazamiento_id, lat, lon)
+
+    Returns:
+        dict: {emplazamiento_id: ACTUALIZADO | NO_ENCONTRADO | COORDENADAS_INVALIDAS}
+    """
+    resultados = {}
+    filas = {}
+    for emplazamiento_id, lat, lon in coordenadas:
+        clave = str(emplazamiento_id).strip()
+        if _coordenadas_validas(lat, lon):
+            # Si un emplazamiento llega repetido, gana el último
+            filas[clave] = (clave, float(lon), float(lat))
+            resultados.pop(clave, None)
+        else:
+            resultados[clave] = COORDENADAS_INVALIDAS
+            filas.pop(clave, None)
+
+    if not filas:
+        return resultados
+
+    # Tablas temporales con los mismos tipos que la tabla de emplazamientos
+    cursor.execute(f"""
+        IF OBJECT_ID('tempdb..#coords') IS NOT NULL DROP TABLE #coords;
+        IF OBJECT_ID('tempdb..#actualizados') IS NOT NULL DROP TABLE #actualizados;
+        SELECT TOP 0 [Nº Emplazamiento], PuntoX, PuntoY INTO #coords FROM {TABLA_EMPLAZAMIENTOS};
+        SELECT TOP 0 [Nº Emplazamiento] INTO #actualizados FROM {TABLA_EMPLAZAMIENTOS};
+    """)
+    fast_executemany = getattr(cursor, 'fast_executemany', False)
+    try:
+        cursor.fast_executemany = True
+        try:
+            cursor.executemany(
+                "INSERT INTO #coords ([Nº Emplazamiento], PuntoX, PuntoY) VALUES (?, ?, ?)",
+                list(filas.values()),
+            )
+        finally:
+            cursor.fast_executemany = fast_executemany
+
+        # OUTPUT ... INTO (y no OUTPUT directo) para que funcione aunque la tabla tenga triggers
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            UPDATE e
+            SET e.PuntoX = c.PuntoX, e.PuntoY = c.PuntoY
+            OUTPUT inserted.[Nº Emplazamiento] INTO #actualizados
+            FROM {TABLA_EMPLAZAMIENTOS} e
+            JOIN #coords c ON c.[Nº Emplazamiento] = e.[Nº Emplazamiento]
+            WHERE e.[Tipo Emplazamiento] = 1;
+            SELECT DISTINCT [Nº Emplazamiento] FROM #actualizados;
+        """)
+        # SQL Server compara sin distinguir mayúsculas: aquí igual
+        actualizados = {str(row[0]).strip().upper() for row in cursor.fetchall()}
+    finally:
+        try:
+            cursor.execute("DROP TABLE #coords; DROP TABLE #actualizados;")
+        except Exception as e:
+            # Que un fallo al limpiar no tape el error original (las temporales
+            # desaparecen igualmente al cerrar la conexión)
+            print(f"No se pudieron borrar las tablas temporales de coordenadas: {e}")
+
+    for clave in filas:
+        resultados[clave] = ACTUALIZADO if clave.upper() in actualizados else NO_ENCONTRADO
+    return resultados
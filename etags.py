@@ -0,0 +1,46 @@
+"""
+Validadores ETag para los endpoints de lectura.
+
+El ETag se calcula a partir de lo que determina la respuesta (ruta,
+parámetros de la petición y versión de los datos: la del snapshot en
+memoria, no el contenido), así que se puede comprobar If-None-Match y
+responder 304 antes de construir la respuesta y sin consultar la BD.
+"""
+import hashlib
+
+from flask import Response, request
+
+# Los navegadores pueden reutilizar la respuesta, pero siempre revalidando
+CACHE_CONTROL = 'private, no-cache'
+
+
+def calcular_etag(*partes):
+    """ETag (sin comillas) a partir de las partes que determinan la respuesta."""
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()[:24]
+
+
+def partes_peticion():
+    """Ruta y parámetros de la petición actual, en orden estable."""
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def no_modificado(etag):
+    """
+    True si la petición trae If-None-Match con este ETag. La comparación es
+    débil: las respuestas comprimidas llevan el ETag como W/"..."
+    """
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+
+def respuesta_no_modificada(etag):
+    """Respuesta 304 (sin cuerpo) con el ETag."""
+    response = Response(status=304)
+    return poner_etag(response, etag)
+
+
+def poner_etag(response, etag):
+    """Añade ETag (y Cache-Control si no lo tiene) a una respuesta 200."""
+    if etag is not None and response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.headers.setdefault('Cache-Control', CACHE_CONTROL)
+    return response
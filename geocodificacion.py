@@ -0,0 +1,639 @@
+"""
+Geocodificación de emplazamientos y direcciones dentro de las Islas Baleares.
+
+Proveedores (Google Maps, Photon, Bing Maps y Nominatim) con caché
+persistente (cache_geocodificacion) y geocode_address, que los combina por
+orden de prioridad. Vive fuera de main.py para que los scripts (p. ej.
+backfill_coordenadas.py) puedan geocodificar sin importar la aplicación
+Flask ni abrir sus cachés y colas.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import requests
+
+from cache_geocodificacion import ErrorGeocodificacion, cache as geocoding_cache
+from config.api_keys import GEOCODING_SERVICES, SEARCH_CONFIG
+
+
+def _baleares_bounds():
+    return SEARCH_CONFIG.get('baleares_bounds', {
+        'lat_min': 38.62, 'lat_max': 40.12, 'lon_min': 1.10, 'lon_max': 4.42,
+    })
+
+
+def _coordenada_en_baleares(lat, lon):
+    """Comprueba si unas coordenadas caen dentro del rectángulo de las Baleares."""
+    if lat is None or lon is None:
+        return False
+    b = _baleares_bounds()
+    return (
+        b['lat_min'] <= float(lat) <= b['lat_max']
+        and b['lon_min'] <= float(lon) <= b['lon_max']
+    )
+
+
+def _texto_indica_baleares(*textos):
+    terms = SEARCH_CONFIG.get('baleares_terms') or ()
+    blob = ' '.join(str(t) for t in textos if t).lower()
+    return any(term in blob for term in terms)
+
+
+def _resultado_google_en_baleares(result):
+    """Filtra resultados de Google Geocoding: solo Islas Baleares."""
+    location = result.get('geometry', {}).get('location', {})
+    lat = location.get('lat')
+    lon = location.get('lng')
+    if not _coordenada_en_baleares(lat, lon):
+        return False
+
+    componentes = result.get('address_components') or []
+    nombres = [result.get('formatted_address', '')]
+    for comp in componentes:
+        nombres.append(comp.get('long_name', ''))
+        nombres.append(comp.get('short_name', ''))
+
+    if _texto_indica_baleares(*nombres):
+        return True
+
+    # Dentro del bbox insular: aceptar (evita falsos positivos en península por lon)
+    return True
+
+
+@geocoding_cache.cacheado('google_opciones', si_error=list)
+def _opciones_google(direccion):
+    """Resultados de Google Geocoding dentro de las Islas Baleares (sin límite)."""
+    try:
+        if not GEOCODING_SERVICES['google_maps']['api_key']:
+            raise ErrorGeocodificacion("API key de Google Maps no configurada")
+
+        b = _baleares_bounds()
+        admin_area = SEARCH_CONFIG.get('baleares_admin_area', 'Illes Balears')
+        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        params = {
+            'address': direccion.strip(),
+            'key': GEOCODING_SERVICES['google_maps']['api_key'],
+            'region': 'es',
+            'components': f"country:ES|administrative_area:{admin_area}",
+            'bounds': f"{b['lat_min']},{b['lon_min']}|{b['lat_max']},{b['lon_max']}",
+        }
+
+        response = requests.get(url, params=params, timeout=SEARCH_CONFIG.get('timeout', 10))
+        if response.status_code != 200:
+            raise ErrorGeocodificacion(f"Google Maps HTTP {response.status_code}")
+
+        data = response.json()
+        if data.get('status') == 'ZERO_RESULTS':
+            return []
+        if data.get('status') != 'OK':
+            raise ErrorGeocodificacion(f"Google Maps {data.get('status')}: {data.get('error_message', '')}")
+
+        opciones = []
+        for result in data['results']:
+            if not _resultado_google_en_baleares(result):
+                continue
+            location = result['geometry']['location']
+            opciones.append({
+                'direccion': result.get('formatted_address', direccion),
+                'lat': location['lat'],
+                'lon': location['lng'],
+            })
+        return opciones
+
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error al geocodificar dirección (opciones): {e}") from e
+
+
+def geocodificar_direccion_opciones(direccion, max_results=10):
+    """
+    Geocodifica una dirección y devuelve opciones dentro de las Islas Baleares.
+
+    Returns:
+        list: [{direccion, lat, lon}, ...]
+    """
+    if not direccion or not str(direccion).strip():
+        return []
+    return _opciones_google(str(direccion))[:max_results]
+
+
+def geocodificar_direccion(direccion):
+    """
+    Geocodifica una dirección usando Google Maps API
+    
+    Args:
+        direccion: Dirección a geocodificar
+        
+    Returns:
+        tuple: (lat, lon) o (None, None) si no se encuentra
+    """
+    opciones = geocodificar_direccion_opciones(direccion, max_results=1)
+    if opciones:
+        return opciones[0]['lat'], opciones[0]['lon']
+    return None, None
+
+
+@geocoding_cache.cacheado('google_inversa')
+def geocodificar_coordenadas(lat, lon):
+    """
+    Geocodificación inversa (coordenadas → dirección) dentro de Baleares.
+    """
+    try:
+        if lat is None or lon is None:
+            return None
+        if not _coordenada_en_baleares(lat, lon):
+            return None
+        if not GEOCODING_SERVICES['google_maps']['api_key']:
+            raise ErrorGeocodificacion("API key de Google Maps no configurada")
+
+        url = 'https://maps.googleapis.com/maps/api/geocode/json'
+        params = {
+            'latlng': f'{lat},{lon}',
+            'key': GEOCODING_SERVICES['google_maps']['api_key'],
+            'region': 'es',
+            'language': 'es',
+        }
+        response = requests.get(url, params=params, timeout=SEARCH_CONFIG.get('timeout', 10))
+        if response.status_code != 200:
+            raise ErrorGeocodificacion(f"Google Maps HTTP {response.status_code}")
+
+        data = response.json()
+        if data.get('status') == 'ZERO_RESULTS':
+            return None
+        if data.get('status') != 'OK':
+            raise ErrorGeocodificacion(f"Google Maps {data.get('status')}: {data.get('error_message', '')}")
+
+        for result in data['results']:
+            if not _resultado_google_en_baleares(result):
+                continue
+            location = result['geometry']['location']
+            return {
+                'direccion': result.get('formatted_address', ''),
+                'lat': location.get('lat', lat),
+                'lon': location.get('lng', lon),
+            }
+        return None
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f'Error en geocodificación inversa: {e}') from e
+
+
+@geocoding_cache.cacheado('google_maps', decodificar=tuple, si_error=lambda: (None, None))
+def geocode_with_google_maps(parada, description, address):
+    """
+    Geocodifica usando Google Maps API (más preciso para paradas de autobús)
+    
+    Args:
+        parada: Número de emplazamiento/parada
+        description: Descripción del emplazamiento
+        address: Dirección del emplazamiento
+        
+    Returns:
+        tuple: (lat, lon) o (None, None) si no se encuentra
+    """
+    if not address or address.strip() == '':
+        return None, None
+    
+    try:
+        # Construir búsqueda específica para paradas de autobús
+        search_terms = []
+        
+        if parada and description and description.strip():
+            bus_stop_search = f"Bus stop {parada}- {description.strip()}"
+            search_terms.append(bus_stop_search)
+        
+        #if address and address.strip():
+         #   search_terms.append(address.strip())
+        
+        search_terms.append("Palma de Mallorca")
+        full_search = ", ".join(search_terms)
+        
+        print(f"Buscando con Google Maps: {full_search}")
+        
+        # Usar Google Maps Geocoding API
+        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        params = {
+            'address': full_search,
+            'key': GEOCODING_SERVICES['google_maps']['api_key'],
+            'region': 'es',  # Priorizar España
+            'components': 'country:ES|administrative_area:Islas Baleares'
+        }
+        
+        response = requests.get(url, params=params, timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data['status'] == 'OK' and data['results']:
+                location = data['results'][0]['geometry']['location']
+                lat = location['lat']
+                lon = location['lng']
+                print(f"Google Maps geocodificación exitosa para parada {parada}: {lat}, {lon}")
+                return lat, lon
+            if data.get('status') == 'ZERO_RESULTS':
+                return None, None
+            # Si la API key es inválida, deshabilitar Google Maps temporalmente
+            if data.get('status') == 'REQUEST_DENIED':
+                print("API key de Google Maps inválida, deshabilitando temporalmente...")
+                GEOCODING_SERVICES['google_maps']['enabled'] = False
+            raise ErrorGeocodificacion(
+                f"Google Maps error para parada {parada}: {data.get('status', 'Unknown error')} - {data.get('error_message', '')}"
+            )
+        raise ErrorGeocodificacion(f"Google Maps HTTP error para parada {parada}: {response.status_code}")
+        
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error en geocodificación Google Maps para parada {parada}: {e}") from e
+
+@geocoding_cache.cacheado('bing_maps', decodificar=tuple, si_error=lambda: (None, None))
+def geocode_with_bing_maps(parada, description, address):
+    """
+    Geocodifica usando Bing Maps API (alternativa gratuita)
+    
+    Args:
+        parada: Número de emplazamiento/parada
+        description: Descripción del emplazamiento
+        address: Dirección del emplazamiento
+        
+    Returns:
+        tuple: (lat, lon) o (None, None) si no se encuentra
+    """
+    if not address or address.strip() == '':
+        return None, None
+    
+    try:
+        # Construir búsqueda específica para paradas de autobús
+        search_terms = []
+        
+        if parada and description and description.strip():
+            bus_stop_search = f"Parada bus {parada}- {description.strip()}"
+            search_terms.append(bus_stop_search)
+        
+        if address and address.strip():
+            search_terms.append(address.strip())
+        
+        search_terms.append("Mallorca, Islas Baleares, España")
+        full_search = ", ".join(search_terms)
+        
+        print(f"Buscando con Bing Maps: {full_search}")
+        
+        # Usar Bing Maps API
+        url = "https://dev.virtualearth.net/REST/v1/Locations"
+        params = {
+            'q': full_search,
+            'key': GEOCODING_SERVICES['bing_maps']['api_key'],
+            'c': 'es',  # País España
+            'maxResults': 1
+        }
+        
+        response = requests.get(url, params=params, timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('resourceSets') and data['resourceSets'][0].get('resources'):
+                location = data['resourceSets'][0]['resources'][0]['point']['coordinates']
+                lat = location[0]  # Bing devuelve [lat, lon]
+                lon = location[1]
+                print(f"Bing Maps geocodificación exitosa para parada {parada}: {lat}, {lon}")
+                return lat, lon
+            # Verificar si hay errores de autenticación
+            if data.get('errorDetails'):
+                if 'InvalidCredentials' in str(data['errorDetails']):
+                    print("API key de Bing Maps inválida, deshabilitando temporalmente...")
+                    GEOCODING_SERVICES['bing_maps']['enabled'] = False
+                raise ErrorGeocodificacion(f"Bing Maps error: {data['errorDetails']}")
+            print(f"Bing Maps no encontró resultados para parada {parada}")
+            return None, None
+        raise ErrorGeocodificacion(f"Bing Maps HTTP error para parada {parada}: {response.status_code}")
+        
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error en geocodificación Bing Maps para parada {parada}: {e}") from e
+
+
+
+@geocoding_cache.cacheado('photon', decodificar=tuple, si_error=lambda: (None, None))
+def geocode_with_photon(parada, description, address):
+    """
+    Usa Photon API (gratuito, basado en OpenStreetMap pero más preciso)
+    """
+    if not address or address.strip() == '':
+        return None, None
+    
+    try:
+        # Construir búsqueda
+        search_terms = []
+        
+        if parada and description and description.strip():
+            search_terms.append(f"Parada bus {parada}- {description.strip()}")
+        
+        if address and address.strip():
+            search_terms.append(address.strip())
+        
+        search_terms.append("Mallorca, España")
+        full_search = ", ".join(search_terms)
+        
+        print(f"Buscando con Photon: {full_search}")
+        
+        url = "https://photon.komoot.io/api"
+        params = {
+            'q': full_search,
+            'limit': 5,
+            'lat': 39.5696,  # Centro de Mallorca
+            'lon': 2.6502,
+            'radius': 50000  # 50km de radio
+        }
+        
+        response = requests.get(url, params=params, timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('features'):
+                # Buscar el resultado más relevante
+                for feature in data['features']:
+                    properties = feature.get('properties', {})
+                    name = properties.get('name', '').lower()
+                    city = properties.get('city', '').lower()
+                    
+                    if 'mallorca' in city or 'palma' in city:
+                        coords = feature['geometry']['coordinates']
+                        lon = coords[0]
+                        lat = coords[1]
+                        print(f"Photon geocodificación exitosa para parada {parada}: {lat}, {lon}")
+                        return lat, lon
+                
+                # Si no encuentra específico de Mallorca, usar el primero
+                coords = data['features'][0]['geometry']['coordinates']
+                lon = coords[0]
+                lat = coords[1]
+                print(f"Photon geocodificación exitosa para parada {parada} (genérico): {lat}, {lon}")
+                return lat, lon
+            return None, None
+        
+        raise ErrorGeocodificacion(f"Photon HTTP error para parada {parada}: {response.status_code}")
+        
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error en geocodificación Photon para parada {parada}: {e}") from e
+
+# Proveedores para geocodificar emplazamientos, por orden de prioridad
+PROVEEDORES_GEOCODIFICACION = ('google_maps', 'photon', 'bing_maps', 'nominatim')
+
+_geocoding_executor = ThreadPoolExecutor(
+    max_workers=SEARCH_CONFIG.get('carrera', {}).get('workers', 8),
+    thread_name_prefix='geocoder',
+)
+
+
+def _proveedores_geocodificacion():
+    """[(nombre, función)] de los proveedores habilitados, por prioridad."""
+    funciones = {
+        'google_maps': geocode_with_google_maps,
+        'photon': geocode_with_photon,
+        'bing_maps': geocode_with_bing_maps,
+        'nominatim': geocode_with_nominatim,
+    }
+    return [
+        (nombre, funciones[nombre])
+        for nombre in PROVEEDORES_GEOCODIFICACION
+        if GEOCODING_SERVICES.get(nombre, {}).get('enabled', True)
+    ]
+
+
+def _resultado_geocodificacion_valido(result):
+    return bool(
+        result and result[0] and result[1]
+        and _coordenada_en_baleares(result[0], result[1])
+    )
+
+
+def _proveedores_carrera(proveedores, config):
+    """
+    Reparte los proveedores habilitados en (carrera, resto): en la carrera
+    solo los de config['proveedores'] (nunca Nominatim), en orden de prioridad.
+    """
+    en_carrera = set(config.get('proveedores', ('google_maps', 'photon'))) - {'nominatim'}
+    carrera = [(nombre, funcion) for nombre, funcion in proveedores if nombre in en_carrera]
+    resto = [(nombre, funcion) for nombre, funcion in proveedores if nombre not in en_carrera]
+    return carrera, resto
+
+
+def _geocode_address_secuencial(parada, description, address, proveedores):
+    for nombre, funcion in proveedores:
+        print(f"Intentando geocodificación con {nombre} para parada {parada}...")
+        result = funcion(parada, description, address)
+        if _resultado_geocodificacion_valido(result):
+            print(f"Geocodificación exitosa con {nombre} para parada {parada}")
+            return result
+    return None, None
+
+
+def _geocode_address_carrera(parada, description, address, proveedores, config):
+    """
+    Lanza todos los proveedores a la vez y devuelve el resultado válido del
+    de mayor prioridad. Un proveedor que supera su presupuesto (o el plazo
+    total) se ignora; su petición termina en segundo plano.
+    """
+    inicio = time.monotonic()
+    limite = inicio + config.get('deadline', 12)
+    presupuestos = config.get('budgets', {})
+    futuros = [
+        (nombre, _geocoding_executor.submit(funcion, parada, description, address),
+         inicio + presupuestos.get(nombre, SEARCH_CONFIG.get('timeout', 10)))
+        for nombre, funcion in proveedores
+    ]
+    try:
+        for nombre, futuro, fin in futuros:
+            espera = max(min(fin, limite) - time.monotonic(), 0)
+            try:
+                result = futuro.result(timeout=espera)
+            except FuturesTimeoutError:
+                print(f"{nombre} superó su presupuesto de tiempo para parada {parada}")
+                continue
+            except Exception as e:
+                print(f"Error en geocodificación {nombre} para parada {parada}: {e}")
+                continue
+            if _resultado_geocodificacion_valido(result):
+                print(f"Geocodificación exitosa con {nombre} para parada {parada} "
+                      f"({time.monotonic() - inicio:.2f}s)")
+                return result
+        return None, None
+    finally:
+        # Los que aún no han empezado no llegan a lanzarse
+        for _, futuro, _ in futuros:
+            futuro.cancel()
+
+
+def geocode_address(parada, description, address):
+    """
+    Geocodifica un emplazamiento usando múltiples estrategias
+    Especializado para direcciones de Mallorca
+    
+    Por defecto consulta en paralelo los primeros proveedores
+    (SEARCH_CONFIG['carrera']['proveedores']: Google y Photon) y se queda con
+    el primer resultado válido en Baleares por orden de prioridad. Solo si no
+    hay ninguno prueba los demás (Bing, Nominatim) uno tras otro. Si la
+    carrera está deshabilitada los prueba todos uno tras otro.
+    
+    Args:
+        parada: Número de emplazamiento/parada
+        description: Descripción del emplazamiento
+        address: Dirección del emplazamiento
+        
+    Returns:
+        tuple: (lat, lon) o (None, None) si no se encuentra
+    """
+    if not address or address.strip() == '':
+        return None, None
+    
+    proveedores = _proveedores_geocodificacion()
+    config = SEARCH_CONFIG.get('carrera', {})
+    carrera, resto = _proveedores_carrera(proveedores, config)
+    if config.get('enabled', True) and len(carrera) > 1:
+        result = _geocode_address_carrera(parada, description, address, carrera, config)
+        if not _resultado_geocodificacion_valido(result):
+            result = _geocode_address_secuencial(parada, description, address, resto)
+    else:
+        result = _geocode_address_secuencial(parada, description, address, proveedores)
+    
+    if not _resultado_geocodificacion_valido(result):
+        print(f"No se pudo geocodificar la parada {parada} con ningún servicio")
+        return None, None
+    return result
+
+@geocoding_cache.cacheado('nominatim', decodificar=tuple, si_error=lambda: (None, None))
+def geocode_with_nominatim(parada, description, address):
+    """
+    Geocodifica usando Nominatim (OpenStreetMap) con múltiples estrategias
+    """
+    if not address or address.strip() == '':
+        return None, None
+    
+    try:
+        # Estrategia 1: Búsqueda completa con parada
+        if parada and description and description.strip():
+            search_terms = [
+                f"Parada bus {parada}- {description.strip()}",
+                address.strip(),
+                "Mallorca, Islas Baleares, España"
+            ]
+            full_search = ", ".join(search_terms)
+            
+            print(f"Estrategia 1 - Búsqueda completa: {full_search}")
+            result = try_nominatim_search(full_search, parada)
+            if result[0] and result[1]:
+                return result
+        
+        # Estrategia 2: Solo descripción + dirección
+        if description and description.strip() and address and address.strip():
+            search_terms = [
+                description.strip(),
+                address.strip(),
+                "Mallorca, España"
+            ]
+            full_search = ", ".join(search_terms)
+            
+            print(f"Estrategia 2 - Descripción + dirección: {full_search}")
+            result = try_nominatim_search(full_search, parada)
+            if result[0] and result[1]:
+                return result
+        
+        # Estrategia 3: Solo dirección + Mallorca
+        if address and address.strip():
+            search_terms = [
+                address.strip(),
+                "Mallorca, España"
+            ]
+            full_search = ", ".join(search_terms)
+            
+            print(f"Estrategia 3 - Solo dirección: {full_search}")
+            result = try_nominatim_search(full_search, parada)
+            if result[0] and result[1]:
+                return result
+        
+        # Estrategia 4: Búsqueda más simple
+        if address and address.strip():
+            simple_search = f"{address.strip()}, Mallorca"
+            print(f"Estrategia 4 - Búsqueda simple: {simple_search}")
+            result = try_nominatim_search(simple_search, parada)
+            if result[0] and result[1]:
+                return result
+        
+        print(f"No se pudo geocodificar la parada {parada} con Nominatim")
+        return None, None
+        
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error en geocodificación Nominatim para parada {parada}: {e}") from e
+
+# Nominatim: una petición cada vez y como mucho una por segundo en todo el
+# proceso (política de uso de nominatim.openstreetmap.org)
+NOMINATIM_INTERVALO = 1.0
+_nominatim_lock = threading.Lock()
+_nominatim_ultima = 0.0
+
+
+def _esperar_turno_nominatim():
+    """Con _nominatim_lock tomado: espera hasta que ha pasado NOMINATIM_INTERVALO."""
+    global _nominatim_ultima
+    espera = _nominatim_ultima + NOMINATIM_INTERVALO - time.monotonic()
+    if espera > 0:
+        time.sleep(espera)
+    _nominatim_ultima = time.monotonic()
+
+
+def try_nominatim_search(search_query, parada):
+    """
+    Intenta una búsqueda específica con Nominatim
+    """
+    try:
+        url = "https://nominatim.openstreetmap.org/search"
+        params = {
+            'q': search_query,
+            'format': 'json',
+            'limit': 3,  # Obtener más resultados para mejor precisión
+            'countrycodes': 'es',
+            'addressdetails': 1,
+            'bounded': 1,
+            'viewbox': '2.5,39.3,3.2,39.9'
+        }
+        
+        headers = {
+            'User-Agent': 'GIS-WebApp/1.0'
+        }
+        
+        with _nominatim_lock:
+            _esperar_turno_nominatim()
+            response = requests.get(url, params=params, headers=headers, timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data and len(data) > 0:
+                # Buscar el resultado más relevante
+                for result in data:
+                    display_name = result.get('display_name', '').lower()
+                    if 'mallorca' in display_name or 'balear' in display_name:
+                        lat = float(result['lat'])
+                        lon = float(result['lon'])
+                        print(f"Nominatim geocodificación exitosa para parada {parada}: {lat}, {lon}")
+                        return lat, lon
+                
+                # Si no encuentra uno específico de Mallorca, usar el primero
+                lat = float(data[0]['lat'])
+                lon = float(data[0]['lon'])
+                print(f"Nominatim geocodificación exitosa para parada {parada} (resultado genérico): {lat}, {lon}")
+                return lat, lon
+            return None, None
+        
+        raise ErrorGeocodificacion(f"Nominatim HTTP error: {response.status_code}")
+        
+    except ErrorGeocodificacion:
+        raise
+    except Exception as e:
+        raise ErrorGeocodificacion(f"Error en búsqueda Nominatim: {e}") from e
@@ -3,16 +3,18 @@ Integración BC / GTask para incidencias en popups (misma lógica que Rutas).
 """
 import json
 import logging
-import uuid
 from urllib.parse import quote
 
 import requests
 from flask import request
 
-from config.bc_incidencias import BC_CONFIG, get_bc_auth_header, get_bc_auth_credentials
+from cliente_bc import cliente as cliente_bc
+from config.bc_incidencias import BC_CONFIG
 from gtask_auth import GTaskAuth
+from sesiones import crear_almacen
 
-_sessions = {}
+# Sesiones GTask por dispositivo (X-Device-ID), con caducidad y tamaño máximo
+sesiones = crear_almacen(lambda: {"user_data": None, "gtask_auth": GTaskAuth()})
 
 
 def get_device_id():
@@ -20,36 +22,35 @@ def get_device_id():
     if did:
         return did.strip()
     if request.is_json:
-        did = (request.get_json() or {}).get("device_id")
+        did = (request.get_json(silent=True) or {}).get("device_id")
         if did:
-            return str(did)
-    return str(uuid.uuid4())
+            return str(did).strip()
+    return ""
+
+
+def get_device_session(crear=False):
+    """
+    Sesión del dispositivo de la petición. Sin X-Device-ID (o sin sesión y
+    con crear=False) devuelve None: las peticiones anónimas no crean sesión.
+    """
+    return sesiones.obtener(get_device_id(), crear=crear)
 
 
-def get_device_session():
-    device_id = get_device_id()
-    if device_id not in _sessions:
-        _sessions[device_id] = {"user_data": None, "gtask_auth": GTaskAuth()}
-    return _sessions[device_id]
+def close_device_session():
+    sesiones.eliminar(get_device_id())
 
 
 def bc_post_json_text(endpoint_path: str, payload: dict, timeout=None):
     base_url = (BC_CONFIG.get("base_url") or "").rstrip("/")
     company = BC_CONFIG.get("company", "Malla Publicidad")
     url = f"{base_url}{endpoint_path}?company='{company}'"
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    auth_header = get_bc_auth_header()
-    auth_credentials = get_bc_auth_credentials() if not auth_header else None
-    if auth_header:
-        headers["Authorization"] = auth_header
+    headers = {"Content-Type": "application/json"}
     datos = {"jsonText": json.dumps(payload, ensure_ascii=False)}
-    if timeout is None:
-        timeout = BC_CONFIG.get("timeout", 120)
-    response = requests.post(
+    response = cliente_bc.post(
         url,
+        "incidencia_gtask",
         headers=headers,
         data=json.dumps(datos),
-        auth=auth_credentials,
         timeout=timeout,
     )
     if response.status_code not in (200, 201):
@@ -90,6 +91,8 @@ def bc_document_no_from_lista_row(inc: dict) -> str:
 
 
 def get_gtask_user_id_from_session(sess) -> str:
+    if not sess:
+        return ""
     user = sess.get("user_data") or {}
     gtask_auth = sess.get("gtask_auth")
     if gtask_auth and gtask_auth.is_token_valid() and gtask_auth.current_user:
@@ -98,25 +101,38 @@ def get_gtask_user_id_from_session(sess) -> str:
     return str(uid).strip() if uid else ""
 
 
+def _incidencia_desde_fila(inc: dict) -> dict:
+    return {
+        "documentNo": bc_document_no_from_lista_row(inc),
+        "resource": str(inc.get("Recurso") or "").strip(),
+        "description": (
+            inc.get("Descripcion")
+            or inc.get("descripcion")
+            or inc.get("Description")
+            or ""
+        ),
+        "fechaHora": inc.get("FechaHora")
+        or inc.get("Fecha_Hora")
+        or inc.get("fechaHora")
+        or "",
+    }
+
+
+def _ordenar_incidencias(incidencias: list) -> list:
+    incidencias.sort(key=lambda x: str(x.get("fechaHora") or ""), reverse=True)
+    return incidencias
+
+
 def get_open_incidences_for_resource(resource_id: str, gtask_user_id: str) -> list:
     if not resource_id or not gtask_user_id:
         return []
 
     lista_url = bc_lista_incidencias_url()
-    headers = {"Accept": "application/json"}
-    auth_header = get_bc_auth_header()
-    auth_credentials = get_bc_auth_credentials() if not auth_header else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-
     recurso_odata = str(resource_id).replace("'", "''")
     odata_filter = f"Estado eq 'Abierta' and Recurso eq '{recurso_odata}'"
     params = {"$filter": odata_filter}
-    timeout = BC_CONFIG.get("timeout", 60)
 
-    resp = requests.get(
-        lista_url, headers=headers, params=params, auth=auth_credentials, timeout=timeout
-    )
+    resp = cliente_bc.get(lista_url, "lista_incidencias", params=params)
     if resp.status_code != 200:
         logging.warning(
             "ListaIncidencias %s para recurso %s: %s %s",
@@ -136,24 +152,44 @@ def get_open_incidences_for_resource(resource_id: str, gtask_user_id: str) -> li
         ).strip()
         if inc_user_id != user_id_str:
             continue
-        doc_no = bc_document_no_from_lista_row(inc)
-        if not doc_no:
-            continue
-        result.append(
-            {
-                "documentNo": doc_no,
-                "resource": str(inc.get("Recurso") or "").strip(),
-                "description": (
-                    inc.get("Descripcion")
-                    or inc.get("descripcion")
-                    or inc.get("Description")
-                    or ""
-                ),
-                "fechaHora": inc.get("FechaHora")
-                or inc.get("Fecha_Hora")
-                or inc.get("fechaHora")
-                or "",
-            }
-        )
-    result.sort(key=lambda x: str(x.get("fechaHora") or ""), reverse=True)
-    return result
+        incidencia = _incidencia_desde_fila(inc)
+        if incidencia["documentNo"]:
+            result.append(incidencia)
+    return _ordenar_incidencias(result)
+
+
+def get_open_incidences_for_user(gtask_user_id: str) -> dict:
+    """
+    Todas las incidencias abiertas del usuario GTask, en una consulta a
+    ListaIncidencias filtrada por usuario (siguiendo @odata.nextLink si BC
+    pagina), agrupadas por recurso: {recurso: [incidencias más recientes primero]}.
+    Lanza requests.HTTPError si BC no responde 200.
+    """
+    campo = BC_CONFIG.get("campo_usuario_gtask") or "Id_Uduario_Gtask"
+    user_id_str = str(gtask_user_id).strip()
+    usuario_odata = user_id_str.replace("'", "''")
+    url = bc_lista_incidencias_url()
+    params = {"$filter": f"Estado eq 'Abierta' and {campo} eq '{usuario_odata}'"}
+
+    por_recurso = {}
+    while url:
+        resp = cliente_bc.get(url, "lista_incidencias_usuario", params=params)
+        if resp.status_code != 200:
+            raise requests.HTTPError(
+                f"BC {resp.status_code}: {(resp.text or '')[:500]}",
+                response=resp,
+            )
+        datos = resp.json()
+        for inc in datos.get("value", []):
+            if str(inc.get(campo) or "").strip() != user_id_str:
+                continue
+            incidencia = _incidencia_desde_fila(inc)
+            if incidencia["documentNo"]:
+                por_recurso.setdefault(incidencia["resource"], []).append(incidencia)
+        # nextLink ya lleva el filtro y el salto de página
+        url = datos.get("@odata.nextLink")
+        params = None
+
+    for incidencias in por_recurso.values():
+        _ordenar_incidencias(incidencias)
+    return por_recurso
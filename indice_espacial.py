@@ -0,0 +1,119 @@
+"""
+Índice espacial en rejilla sobre las coordenadas (PuntoY, PuntoX) de un snapshot.
+
+Las búsquedas por radio solo recorren las celdas que se solapan con el
+rectángulo que envuelve el círculo, en lugar de calcular la distancia a
+todas las filas. El índice devuelve candidatos; el filtrado exacto por
+distancia lo hace quien llama.
+"""
+import math
+import threading
+
+from distancias import RADIO_TIERRA_KM
+
+# Kilómetros por grado de latitud (mismo radio terrestre que la haversine)
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+
+class IndiceEspacial:
+    """Rejilla de celdas de `celda_grados` x `celda_grados` con ids de fila."""
+
+    def __init__(self, celda_grados=0.01):
+        self.celda_grados = celda_grados
+        self._celdas = {}
+        self._posiciones = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def _clave(self, lat, lon):
+        return (math.floor(lat / self.celda_grados), math.floor(lon / self.celda_grados))
+
+    def _insertar(self, fila_id, lat, lon):
+        self._posiciones[fila_id] = (lat, lon)
+        self._celdas.setdefault(self._clave(lat, lon), set()).add(fila_id)
+
+    def _eliminar(self, fila_id):
+        posicion = self._posiciones.pop(fila_id, None)
+        if posicion is None:
+            return
+        clave = self._clave(*posicion)
+        celda = self._celdas.get(clave)
+        if celda is not None:
+            celda.discard(fila_id)
+            if not celda:
+                del self._celdas[clave]
+
+    def insertar(self, fila_id, lat, lon):
+        with self._lock:
+            self._eliminar(fila_id)
+            self._insertar(fila_id, lat, lon)
+
+    def eliminar(self, fila_id):
+        with self._lock:
+            self._eliminar(fila_id)
+
+    def mover(self, fila_id, lat, lon):
+        """Actualiza la posición de una fila (o la quita si ya no tiene coordenadas)."""
+        with self._lock:
+            self._eliminar(fila_id)
+            if lat and lon:
+                self._insertar(fila_id, lat, lon)
+
+    def candidatos_bbox(self, lat_min, lon_min, lat_max, lon_max):
+        """Ids de fila dentro del rectángulo (exacto, no solo por celda)."""
+        cy0, cx0 = self._clave(lat_min, lon_min)
+        cy1, cx1 = self._clave(lat_max, lon_max)
+        resultado = []
+        with self._lock:
+            # Si el rectángulo cubre más celdas de las que hay ocupadas,
+            # es más barato recorrer solo las ocupadas
+            if (cy1 - cy0 + 1) * (cx1 - cx0 + 1) > len(self._celdas):
+                celdas = [
+                    ids for (cy, cx), ids in self._celdas.items()
+                    if cy0 <= cy <= cy1 and cx0 <= cx <= cx1
+                ]
+            else:
+                celdas = [
+                    self._celdas[(cy, cx)]
+                    for cy in range(cy0, cy1 + 1)
+                    for cx in range(cx0, cx1 + 1)
+                    if (cy, cx) in self._celdas
+                ]
+            for ids in celdas:
+                for fila_id in ids:
+                    lat, lon = self._posiciones[fila_id]
+                    if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max:
+                        resultado.append(fila_id)
+        return resultado
+
+    def candidatos_radio(self, lat, lon, radio_km):
+        """Ids de fila dentro del rectángulo que envuelve el círculo de radio_km."""
+        dlat = radio_km / KM_POR_GRADO
+        # El círculo es más ancho (en grados de longitud) en su borde más alejado del ecuador
+        coseno = max(math.cos(math.radians(min(abs(lat) + dlat, 89.0))), 0.01)
+        dlon = radio_km / (KM_POR_GRADO * coseno)
+        return self.candidatos_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+
+    def on_row_updated(self, snapshot, fila_id, anterior, nueva):
+        """Mantiene el índice al día cuando el snapshot actualiza una fila."""
+        lat = snapshot.value(nueva, 'PuntoY')
+        lon = snapshot.value(nueva, 'PuntoX')
+        if (lat, lon) == (snapshot.value(anterior, 'PuntoY'), snapshot.value(anterior, 'PuntoX')):
+            return
+        self.mover(fila_id, float(lat or 0), float(lon or 0))
+
+    @classmethod
+    def desde_snapshot(cls, snapshot, celda_grados=0.01):
+        """Construye el índice con las filas del snapshot que tienen coordenadas."""
+        indice = cls(celda_grados)
+        if not snapshot.has_column('PuntoX') or not snapshot.has_column('PuntoY'):
+            return indice
+        ix = snapshot.index['PuntoX']
+        iy = snapshot.index['PuntoY']
+        for fila_id, row in enumerate(snapshot.rows):
+            lon, lat = row[ix], row[iy]
+            if lat and lon:
+                indice._insertar(fila_id, float(lat), float(lon))
+        return indice
@@ -0,0 +1,191 @@
+"""
+Teselas vectoriales (Mapbox Vector Tile 2.1) de capas de puntos.
+
+El formato es un mensaje protobuf sencillo (Tile > Layer > Feature), así
+que se codifica a mano en lugar de añadir mapbox-vector-tile/protobuf como
+dependencia: solo hacen falta varints, zigzag y campos con longitud.
+
+Las teselas ya codificadas se guardan en CacheTeselas (LRU) con la versión
+del snapshot en la clave: al actualizarse una fila cambia la versión y las
+teselas antiguas dejan de usarse y acaban saliendo por LRU.
+"""
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+# Tamaño de la rejilla de coordenadas dentro de la tesela
+EXTENT = 4096
+
+# Margen alrededor de la tesela (en unidades de EXTENT) para que los
+# símbolos de los puntos del borde no se corten entre teselas
+BUFFER = 64
+
+# Tipo de geometría Point y comando MoveTo con un punto
+_GEOM_POINT = 1
+_MOVE_TO_1 = (1 & 0x7) | (1 << 3)
+
+# Tipos de cable de protobuf
+_VARINT = 0
+_FIXED64 = 1
+_LEN = 2
+
+
+def _varint(valor):
+    partes = bytearray()
+    while True:
+        byte = valor & 0x7F
+        valor >>= 7
+        if valor:
+            partes.append(byte | 0x80)
+        else:
+            partes.append(byte)
+            return bytes(partes)
+
+
+def _zigzag(valor):
+    return (valor << 1) ^ (valor >> 63)
+
+
+def _clave(campo, tipo):
+    return _varint((campo << 3) | tipo)
+
+
+def _campo_len(campo, datos):
+    return _clave(campo, _LEN) + _varint(len(datos)) + datos
+
+
+def _campo_varint(campo, valor):
+    return _clave(campo, _VARINT) + _varint(valor)
+
+
+def _empaquetado(campo, valores):
+    return _campo_len(campo, b''.join(_varint(v) for v in valores))
+
+
+def _valor(valor):
+    """Mensaje Value según el tipo Python del atributo."""
+    if isinstance(valor, bool):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        if valor >= 0:
+            return _campo_varint(5, valor)
+        return _campo_varint(6, _zigzag(valor))
+    if isinstance(valor, float):
+        return _clave(3, _FIXED64) + struct.pack('<d', valor)
+    return _campo_len(1, str(valor).encode('utf-8'))
+
+
+def limites_tesela(z, x, y):
+    """(lon_min, lat_min, lon_max, lat_max) de la tesela z/x/y (Web Mercator)."""
+    n = 2 ** z
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def limites_con_margen(z, x, y, buffer=BUFFER, extent=EXTENT):
+    """limites_tesela ampliados con el margen de BUFFER unidades por cada lado."""
+    margen = buffer / extent
+    lon_min, lat_min, _, _ = limites_tesela(z, x - margen, y + margen)
+    _, _, lon_max, lat_max = limites_tesela(z, x + margen, y - margen)
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def proyectar(lat, lon, z, x, y, extent=EXTENT):
+    """Coordenadas enteras del punto dentro de la tesela z/x/y."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    px = (lon + 180.0) / 360.0 * n
+    rad = math.radians(lat)
+    py = (1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * n
+    return int(round((px - x) * extent)), int(round((py - y) * extent))
+
+
+def codificar_capa(nombre, puntos, extent=EXTENT):
+    """
+    Mensaje Layer con una feature Point por elemento.
+
+    Args:
+        nombre: nombre de la capa (el que usa el cliente para el estilo)
+        puntos: iterable de (px, py, atributos) con px/py ya en unidades
+            de la tesela; los atributos None no se incluyen
+    """
+    claves = {}
+    valores = {}
+    features = []
+    for px, py, atributos in puntos:
+        tags = []
+        for clave, valor in atributos.items():
+            if valor is None:
+                continue
+            if clave not in claves:
+                claves[clave] = len(claves)
+            clave_valor = (type(valor), valor)
+            if clave_valor not in valores:
+                valores[clave_valor] = len(valores)
+            tags.append(claves[clave])
+            tags.append(valores[clave_valor])
+        feature = (
+            _empaquetado(2, tags)
+            + _campo_varint(3, _GEOM_POINT)
+            + _empaquetado(4, (_MOVE_TO_1, _zigzag(px), _zigzag(py)))
+        )
+        features.append(_campo_len(2, feature))
+
+    capa = [_campo_varint(15, 2), _campo_len(1, nombre.encode('utf-8'))]
+    capa.extend(features)
+    capa.extend(_campo_len(3, clave.encode('utf-8')) for clave in claves)
+    capa.extend(_campo_len(4, _valor(valor)) for _, valor in valores)
+    capa.append(_campo_varint(5, extent))
+    return b''.join(capa)
+
+
+def codificar_tesela(capas):
+    """Mensaje Tile a partir de las capas ya codificadas con codificar_capa."""
+    return b''.join(_campo_len(3, capa) for capa in capas)
+
+
+class CacheTeselas:
+    """Teselas codificadas por clave (capa, fechas, filtros, versión, z, x, y), con LRU."""
+
+    def __init__(self, max_teselas=5000):
+        self.max_teselas = max_teselas
+        self._teselas = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def obtener(self, clave, generar):
+        """Devuelve la tesela de la clave, generándola con generar() si no está."""
+        with self._lock:
+            tesela = self._teselas.get(clave)
+            if tesela is not None:
+                self._teselas.move_to_end(clave)
+                self._stats['hits'] += 1
+                return tesela
+            self._stats['misses'] += 1
+
+        tesela = generar()
+        with self._lock:
+            self._teselas[clave] = tesela
+            while len(self._teselas) > self.max_teselas:
+                self._teselas.popitem(last=False)
+                self._stats['evictions'] += 1
+        return tesela
+
+    def stats(self):
+        with self._lock:
+            return {
+                'teselas': len(self._teselas),
+                'max_teselas': self.max_teselas,
+                'bytes': sum(len(t) for t in self._teselas.values()),
+                **self._stats,
+            }
+
+
+def crear_cache():
+    """Caché con la configuración de la variable de entorno MVT_CACHE_MAX_TILES."""
+    return CacheTeselas(max_teselas=int(os.getenv('MVT_CACHE_MAX_TILES', '5000')))
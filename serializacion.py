@@ -0,0 +1,350 @@
+"""
+Serialización JSON de los resultados de la BD.
+
+- SerializadorFilas: mira cursor.description una sola vez y prepara un
+  conversor por columna (fechas a ISO, bytes a texto, Decimal a float), en
+  lugar de inspeccionar el tipo de cada valor de cada fila como clean_data.
+  SerializadorFilas.json() escribe la fila directamente como texto JSON,
+  sin pasar por un dict, para los caminos en streaming.
+- ProveedorJSONRapido: proveedor JSON para app.json que usa orjson si está
+  instalado (y json de la librería estándar si no).
+- Formato columnar (?format=columnar): nombres de columna una sola vez y un
+  array de valores por columna; las columnas con pocos valores distintos
+  (Empresa, Tipo Recurso...) se codifican como índices a un diccionario.
+- En modo streaming la respuesta se genera por bloques de filas a medida que
+  se recorren, en lugar de construir la lista completa y pasarla a jsonify:
+  la memoria por petición no crece con el número de filas y el primer byte
+  sale en cuanto se serializa el primer bloque. Con ?format=ndjson se envía
+  una fila JSON por línea.
+
+Diferencias con el jsonify de Flask que había antes (a propósito):
+- Las columnas Decimal (PuntoX/PuntoY...) salen como números y no como
+  texto ("2.65" pasa a ser 2.65); app.js ya usaba parseFloat y ahora sus
+  comprobaciones de coordenada 0 funcionan
+- Las claves de cada objeto van en el orden de las columnas, no ordenadas
+  alfabéticamente (ordenarlas cuesta tiempo en cada respuesta)
+"""
+import datetime
+import decimal
+import json
+import math
+import uuid
+from json.encoder import encode_basestring
+
+from flask import Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa json
+    orjson = None
+
+# Filas por bloque enviado al cliente
+TAM_BLOQUE = 500
+
+
+def clean_data(data):
+    """Limpia los datos para que sean serializables a JSON"""
+    if isinstance(data, dict):
+        return {k: clean_data(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [clean_data(item) for item in data]
+    elif isinstance(data, bytes):
+        return data.decode('utf-8', errors='ignore') if data else None
+    elif hasattr(data, 'isoformat'):  # datetime objects
+        return data.isoformat()
+    else:
+        return data
+
+
+def _bytes_a_texto(valor):
+    return bytes(valor).decode('utf-8', errors='ignore') if valor else None
+
+
+def _a_iso(valor):
+    return valor.isoformat()
+
+
+# Conversor por tipo de columna (type_code de cursor.description); None = tal cual
+CONVERSORES = {
+    datetime.datetime: _a_iso,
+    datetime.date: _a_iso,
+    datetime.time: _a_iso,
+    decimal.Decimal: float,
+    bytes: _bytes_a_texto,
+    bytearray: _bytes_a_texto,
+    uuid.UUID: str,
+}
+
+
+def _conversor_columna(type_code):
+    conversor = CONVERSORES.get(type_code)
+    if conversor is None:
+        return None
+
+    def convertir(valor):
+        return None if valor is None else conversor(valor)
+
+    return convertir
+
+
+def _float_json(valor):
+    valor = float(valor)
+    # NaN e infinito no existen en JSON: como orjson, null
+    return repr(valor) if math.isfinite(valor) else 'null'
+
+
+def _decimal_json(valor):
+    # El texto de un Decimal finito ya es un número JSON válido
+    return str(valor) if valor.is_finite() else 'null'
+
+
+def _iso_json(valor):
+    return '"' + valor.isoformat() + '"'
+
+
+def _bytes_json(valor):
+    texto = _bytes_a_texto(valor)
+    return 'null' if texto is None else encode_basestring(texto)
+
+
+# Codificador a texto JSON por tipo de columna (valores no nulos)
+CODIFICADORES_JSON = {
+    str: encode_basestring,
+    bool: lambda valor: 'true' if valor else 'false',
+    int: int.__repr__,
+    float: _float_json,
+    decimal.Decimal: _decimal_json,
+    datetime.datetime: _iso_json,
+    datetime.date: _iso_json,
+    datetime.time: _iso_json,
+    bytes: _bytes_json,
+    bytearray: _bytes_json,
+    uuid.UUID: lambda valor: '"' + str(valor) + '"',
+}
+
+
+def _codificador_json(type_code):
+    return CODIFICADORES_JSON.get(type_code) or _dumps
+
+
+class SerializadorFilas:
+    """
+    Convierte filas de un cursor (o de un snapshot) en dicts listos para JSON,
+    con un conversor precalculado por columna.
+    """
+
+    def __init__(self, description, columnas=None):
+        nombres = [column[0] for column in description]
+        indices = {name: i for i, name in enumerate(nombres)}
+        if columnas is None:
+            columnas = nombres
+        self.columnas = [c for c in columnas if c in indices]
+        tipos = {column[0]: column[1] for column in description}
+        self._campos = [
+            (nombre, indices[nombre], _conversor_columna(tipos[nombre]))
+            for nombre in self.columnas
+        ]
+        self._campos_json = [
+            (encode_basestring(nombre) + ':', indices[nombre], _codificador_json(tipos[nombre]))
+            for nombre in self.columnas
+        ]
+
+    def dict(self, row):
+        return {
+            nombre: (conversor(row[i]) if conversor else row[i])
+            for nombre, i, conversor in self._campos
+        }
+
+    def dicts(self, rows):
+        return [self.dict(row) for row in rows]
+
+    def json(self, row):
+        """La fila como texto JSON, igual que dumps(self.dict(row)) pero sin crear el dict."""
+        return '{' + ','.join([
+            prefijo + ('null' if (valor := row[i]) is None else codificar(valor))
+            for prefijo, i, codificar in self._campos_json
+        ]) + '}'
+
+
+def filas_cursor(cursor, rows=None):
+    """Resultados del cursor como lista de dicts listos para JSON."""
+    if rows is None:
+        rows = cursor.fetchall()
+    return SerializadorFilas(cursor.description).dicts(rows)
+
+
+def iterar_filas_cursor(cursor, tam_bloque=TAM_BLOQUE):
+    """Como filas_cursor, pero leyendo del cursor por bloques (fetchmany) a medida que se recorre."""
+    serializador = SerializadorFilas(cursor.description)
+    while True:
+        rows = cursor.fetchmany(tam_bloque)
+        if not rows:
+            return
+        for row in rows:
+            yield serializador.dict(row)
+
+
+def _por_defecto(valor):
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return _bytes_a_texto(valor)
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return DefaultJSONProvider.default(valor)
+
+
+if orjson is not None:
+    def dumps_bytes(valor):
+        return orjson.dumps(valor, default=_por_defecto, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps_bytes(valor):
+        return json.dumps(valor, ensure_ascii=False, separators=(',', ':'),
+                          default=_por_defecto).encode('utf-8')
+
+
+def _dumps(valor):
+    return dumps_bytes(valor).decode('utf-8')
+
+
+class ProveedorJSONRapido(DefaultJSONProvider):
+    """Proveedor JSON de Flask (app.json) que serializa con dumps_bytes."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return _dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def quiere_columnar():
+    """True si la petición pide el formato columnar (?format=columnar)."""
+    return request.args.get('format', '').lower() == 'columnar'
+
+
+def codificar_columnar(filas, max_diccionario=1024):
+    """
+    Convierte una lista de dicts en
+    {columnar: true, filas: n, columnas: [...], valores: {col: [...]}, diccionarios: {col: [...]}}.
+
+    Una columna de texto se codifica con diccionario si tiene como mucho
+    max_diccionario valores distintos y menos de la mitad que filas; sus
+    valores pasan a ser índices del diccionario.
+    """
+    columnas = []
+    vistas = set()
+    for fila in filas:
+        for columna in fila:
+            if columna not in vistas:
+                vistas.add(columna)
+                columnas.append(columna)
+
+    valores = {columna: [fila.get(columna) for fila in filas] for columna in columnas}
+    diccionarios = {}
+    for columna, lista in valores.items():
+        if not lista or not all(v is None or isinstance(v, str) for v in lista):
+            continue
+        distintos = {}
+        for v in lista:
+            if v not in distintos:
+                distintos[v] = len(distintos)
+                if len(distintos) > max_diccionario:
+                    break
+        if len(distintos) > max_diccionario or len(distintos) * 2 > len(lista):
+            continue
+        diccionarios[columna] = list(distintos)
+        valores[columna] = [distintos[v] for v in lista]
+
+    return {
+        'columnar': True,
+        'filas': len(filas),
+        'columnas': columnas,
+        'valores': valores,
+        'diccionarios': diccionarios,
+    }
+
+
+def aplicar_formato(respuesta, *claves):
+    """Si se pide ?format=columnar, codifica en columnas las listas de `claves`."""
+    if quiere_columnar():
+        for clave in claves:
+            if isinstance(respuesta.get(clave), list):
+                respuesta[clave] = codificar_columnar(respuesta[clave])
+        respuesta['formato'] = 'columnar'
+    return respuesta
+
+
+def quiere_stream():
+    """True si la petición pide respuesta en streaming (?stream=1)."""
+    return request.args.get('stream', '').lower() in ('1', 'true', 'si', 'sí')
+
+
+def quiere_ndjson():
+    """True si la petición pide NDJSON (?format=ndjson): un objeto JSON por línea."""
+    return request.args.get('format', '').lower() == 'ndjson'
+
+
+def _texto_json(fila):
+    """Las filas pueden llegar ya como texto JSON (SerializadorFilas.json)."""
+    return fila if isinstance(fila, str) else _dumps(fila)
+
+
+def generar_ndjson(filas, tam_bloque=TAM_BLOQUE):
+    """Genera por bloques de `tam_bloque` filas las líneas NDJSON de las filas."""
+    bloque = []
+    for fila in filas:
+        bloque.append(_texto_json(fila))
+        if len(bloque) >= tam_bloque:
+            yield '\n'.join(bloque) + '\n'
+            bloque = []
+    if bloque:
+        yield '\n'.join(bloque) + '\n'
+
+
+def respuesta_ndjson_stream(filas, **kwargs):
+    """Response de Flask que envía las filas como NDJSON en streaming."""
+    return Response(
+        stream_with_context(generar_ndjson(filas, **kwargs)),
+        mimetype='application/x-ndjson',
+    )
+
+
+def generar_json(cabecera, filas, clave='datos', clave_total='total_registros',
+                 tam_bloque=TAM_BLOQUE):
+    """
+    Genera por trozos el JSON {**cabecera, clave: [filas...], clave_total: n}.
+    El total va al final porque no se conoce hasta recorrer todas las filas.
+    """
+    inicio = _dumps(cabecera)
+    inicio = inicio[:-1] + (',' if cabecera else '') + f'{_dumps(clave)}:['
+    yield inicio
+
+    total = 0
+    bloque = []
+    for fila in filas:
+        bloque.append(_texto_json(fila))
+        total += 1
+        if len(bloque) >= tam_bloque:
+            yield ('' if total == len(bloque) else ',') + ','.join(bloque)
+            bloque = []
+    if bloque:
+        yield ('' if total == len(bloque) else ',') + ','.join(bloque)
+
+    yield f'],{_dumps(clave_total)}:{total}}}'
+
+
+def respuesta_json_stream(cabecera, filas, mimetype='application/json', **kwargs):
+    """Response de Flask que envía generar_json(...) en streaming."""
+    return Response(
+        stream_with_context(generar_json(cabecera, filas, **kwargs)),
+        mimetype=mimetype,
+    )
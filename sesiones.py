@@ -0,0 +1,84 @@
+"""
+Sesiones GTask por dispositivo (cabecera X-Device-ID) con límite de tamaño.
+
+Antes las sesiones se guardaban en un dict sin límite y cada petición sin
+X-Device-ID creaba una nueva con un uuid aleatorio que nadie volvía a usar,
+así que la memoria del worker de IIS solo crecía. AlmacenSesiones:
+
+- Caduca las sesiones sin uso durante `ttl_inactividad` segundos
+- Como mucho `max_sesiones`; al pasarse se expulsa la usada hace más tiempo
+- Solo crea sesión cuando se pide explícitamente (login), no al leer
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class AlmacenSesiones:
+    """
+    crear() -> sesión nueva (dict); se llama solo al crear una sesión.
+    """
+
+    def __init__(self, crear, ttl_inactividad=43200, max_sesiones=1000):
+        self._crear = crear
+        self.ttl_inactividad = ttl_inactividad
+        self.max_sesiones = max_sesiones
+        self._sesiones = OrderedDict()  # device_id -> (ultimo_uso, sesión), la menos usada primero
+        self._lock = threading.Lock()
+        self._stats = {'creadas': 0, 'expiradas': 0, 'evictions': 0, 'cerradas': 0}
+
+    def _purgar_expiradas(self, ahora):
+        """Quita las sesiones caducadas del principio (las menos usadas). Con el lock tomado."""
+        while self._sesiones:
+            device_id, (ultimo_uso, _) = next(iter(self._sesiones.items()))
+            if ahora - ultimo_uso < self.ttl_inactividad:
+                break
+            del self._sesiones[device_id]
+            self._stats['expiradas'] += 1
+
+    def obtener(self, device_id, crear=False):
+        """Sesión del dispositivo; si no hay, una nueva con crear=True o None."""
+        if not device_id:
+            return None
+        ahora = time.time()
+        with self._lock:
+            self._purgar_expiradas(ahora)
+            entrada = self._sesiones.get(device_id)
+            if entrada is not None:
+                sesion = entrada[1]
+            elif crear:
+                sesion = self._crear()
+                self._stats['creadas'] += 1
+            else:
+                return None
+            self._sesiones[device_id] = (ahora, sesion)
+            self._sesiones.move_to_end(device_id)
+            while len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+                self._stats['evictions'] += 1
+            return sesion
+
+    def eliminar(self, device_id):
+        with self._lock:
+            if self._sesiones.pop(device_id, None) is not None:
+                self._stats['cerradas'] += 1
+
+    def stats(self):
+        with self._lock:
+            self._purgar_expiradas(time.time())
+            return {
+                'sesiones': len(self._sesiones),
+                'max_sesiones': self.max_sesiones,
+                'ttl_inactividad': self.ttl_inactividad,
+                **self._stats,
+            }
+
+
+def crear_almacen(crear):
+    """Almacén con la configuración de las variables de entorno GTASK_SESSION_*."""
+    return AlmacenSesiones(
+        crear,
+        ttl_inactividad=int(os.getenv('GTASK_SESSION_IDLE_TTL', '43200')),
+        max_sesiones=int(os.getenv('GTASK_SESSION_MAX', '1000')),
+    )
@@ -0,0 +1,339 @@
+"""
+Caché en memoria de los resultados de las funciones con fechas de la BD
+(RecursosPorFechasGlobal / MobiliarioPorFechas).
+
+Cada combinación (función, fecha_desde, fecha_hasta) se carga una sola vez
+con SELECT * y se comparte entre todos los endpoints, que filtran y
+proyectan en Python. Las entradas caducan por TTL y se expulsan por LRU
+cuando se supera el número máximo de entradas o de filas en memoria.
+
+Cada snapshot tiene una versión que cambia con su contenido. Si al
+recargarlo tras el TTL los datos son los mismos, se conserva el snapshot
+anterior (y su versión). Para las versiones que se entregan a los clientes
+se guarda un hash por fila, y así cambios() puede decir qué filas se han
+añadido, eliminado o modificado desde una versión.
+"""
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config.database import db_connection
+
+RECURSOS = 'RecursosPorFechasGlobal'
+MOBILIARIO = 'MobiliarioPorFechas'
+
+# Solo se permiten estas funciones (el nombre se interpola en la consulta)
+FUNCIONES = (RECURSOS, MOBILIARIO)
+
+# Columna que identifica las filas de cada función (para los cambios entre versiones)
+CLAVES = {
+    RECURSOS: 'No_',
+    MOBILIARIO: 'Nº Emplazamiento',
+}
+
+# Las versiones son "<arranque>-<n>": el identificador aleatorio del proceso
+# evita que, tras un reinicio, una versión antigua de un cliente coincida
+# con otra nueva que haya llegado al mismo número
+ARRANQUE = uuid.uuid4().hex[:12]
+_contador = itertools.count(1)
+
+
+def _nueva_version():
+    return f"{ARRANQUE}-{next(_contador)}"
+
+
+def version_de_este_proceso(version):
+    """True si la versión la ha generado este proceso (desde su arranque)."""
+    return isinstance(version, str) and version.startswith(ARRANQUE + '-')
+
+
+class Snapshot:
+    """Resultado completo de una función para un rango de fechas."""
+
+    def __init__(self, funcion, fecha_desde, fecha_hasta, description, rows):
+        self.funcion = funcion
+        self.fecha_desde = fecha_desde
+        self.fecha_hasta = fecha_hasta
+        self.description = description
+        self.columns = [column[0] for column in description]
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.rows = rows
+        self.loaded_at = time.time()
+        self.version = _nueva_version()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def has_column(self, name):
+        return name in self.index
+
+    def value(self, row, name, default=None):
+        i = self.index.get(name)
+        return row[i] if i is not None else default
+
+    def as_dict(self, row, columns=None):
+        """Convierte una fila en dict (opcionalmente solo con algunas columnas)."""
+        if columns is None:
+            return dict(zip(self.columns, row))
+        return {name: row[self.index[name]] for name in columns if name in self.index}
+
+    def filter(self, predicate=None):
+        """Itera las filas que cumplen el predicado."""
+        if predicate is None:
+            return iter(self.rows)
+        return (row for row in self.rows if predicate(row))
+
+    def find(self, column, value):
+        """Posiciones de las filas cuyo valor en `column` es `value` (comparado como texto)."""
+        if not self.has_column(column):
+            return []
+        posiciones = self.derived(f'posiciones:{column}', lambda s: s._build_positions(column))
+        return list(posiciones.get(str(value).strip(), ()))
+
+    def hashes(self):
+        """
+        {id: hash del contenido de sus filas} en la versión actual. El id es
+        el valor de la columna de CLAVES como texto (la posición si no hay).
+        """
+        i = self.index.get(CLAVES.get(self.funcion))
+        resultado = {}
+        for pos, row in enumerate(self.rows):
+            clave = str(row[i]).strip() if i is not None else str(pos)
+            # Suma: no depende del orden si hay varias filas con el mismo id
+            resultado[clave] = resultado.get(clave, 0) + hash(row)
+        return resultado
+
+    def _build_positions(self, column):
+        i = self.index[column]
+        posiciones = {}
+        for pos, row in enumerate(self.rows):
+            posiciones.setdefault(str(row[i]).strip(), []).append(pos)
+        return posiciones
+
+    def update_row(self, pos, changes):
+        """
+        Sustituye valores de una fila ya cargada (p. ej. coordenadas recién
+        geocodificadas) y avisa a las estructuras derivadas que lo soporten.
+        """
+        anterior = self.rows[pos]
+        nueva = list(anterior)
+        for name, value in changes.items():
+            if name in self.index:
+                nueva[self.index[name]] = value
+        nueva = tuple(nueva)
+        self.rows[pos] = nueva
+        self.version = _nueva_version()
+        for value in list(self._derived.values()):
+            hook = getattr(value, 'on_row_updated', None)
+            if hook is not None:
+                hook(self, pos, anterior, nueva)
+
+    def derived(self, name, builder):
+        """
+        Estructura derivada calculada una sola vez por snapshot
+        (índices, facetas...). builder recibe el snapshot.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = builder(self)
+                    self._derived[name] = value
+        return value
+
+
+class SnapshotCache:
+    """Caché LRU con TTL de snapshots, thread-safe y con carga única por clave."""
+
+    def __init__(self, ttl=120, max_entries=16, max_rows=400000, max_versions=8):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_versions = max_versions
+        self._entries = OrderedDict()
+        self._loading = {}
+        # clave -> OrderedDict(versión -> hashes) de las versiones entregadas
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0, 'expired': 0,
+            'unchanged_reloads': 0,
+        }
+
+    def _load(self, funcion, fecha_desde, fecha_hasta):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM [dbo].[{funcion}](?, ?)", (fecha_desde, fecha_hasta))
+            description = cursor.description
+            rows = [tuple(row) for row in cursor.fetchall()]
+            cursor.close()
+        return Snapshot(funcion, fecha_desde, fecha_hasta, description, rows)
+
+    def _is_fresh(self, snapshot):
+        return time.time() - snapshot.loaded_at < self.ttl
+
+    def peek(self, funcion, fecha_desde, fecha_hasta):
+        """Devuelve el snapshot si está en caché y vigente, sin cargarlo."""
+        key = (funcion, str(fecha_desde), str(fecha_hasta))
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None and self._is_fresh(snapshot):
+                return snapshot
+        return None
+
+    def get(self, funcion, fecha_desde, fecha_hasta):
+        """Devuelve el snapshot de la clave, cargándolo desde la BD si hace falta."""
+        if funcion not in FUNCIONES:
+            raise ValueError(f"Función no permitida: {funcion}")
+        key = (funcion, str(fecha_desde), str(fecha_hasta))
+        previous = None
+
+        while True:
+            with self._lock:
+                snapshot = self._entries.get(key)
+                if snapshot is not None:
+                    if self._is_fresh(snapshot):
+                        self._entries.move_to_end(key)
+                        self._stats['hits'] += 1
+                        return snapshot
+                    del self._entries[key]
+                    self._stats['expired'] += 1
+                    previous = snapshot
+
+                event = self._loading.get(key)
+                if event is None:
+                    # Este hilo hace la carga; el resto espera al evento
+                    event = threading.Event()
+                    self._loading[key] = event
+                    self._stats['misses'] += 1
+                    break
+            event.wait()
+            # Si la carga falló, el siguiente hilo lo vuelve a intentar
+
+        try:
+            snapshot = self._load(funcion, key[1], key[2])
+            unchanged = previous is not None and previous.hashes() == snapshot.hashes()
+            if unchanged:
+                # Mismos datos: se mantiene el snapshot (versión, índices...) anterior
+                previous.loaded_at = snapshot.loaded_at
+                snapshot = previous
+            with self._lock:
+                self._entries[key] = snapshot
+                self._stats['loads'] += 1
+                if unchanged:
+                    self._stats['unchanged_reloads'] += 1
+                self._evict()
+            return snapshot
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def _evict(self):
+        total_rows = sum(len(s) for s in self._entries.values())
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or total_rows > self.max_rows
+        ):
+            _, oldest = self._entries.popitem(last=False)
+            total_rows -= len(oldest)
+            self._stats['evictions'] += 1
+
+    def update_rows(self, funcion, column, value, changes):
+        """Aplica `changes` a las filas con column == value en todos los snapshots de la función."""
+        with self._lock:
+            snapshots = [s for key, s in self._entries.items() if key[0] == funcion]
+        actualizadas = 0
+        for snapshot in snapshots:
+            for pos in snapshot.find(column, value):
+                snapshot.update_row(pos, changes)
+                actualizadas += 1
+        return actualizadas
+
+    def register_version(self, snapshot):
+        """
+        Guarda los hashes de la versión actual del snapshot (la que se va a
+        entregar a un cliente) y devuelve esa versión.
+        """
+        key = (snapshot.funcion, str(snapshot.fecha_desde), str(snapshot.fecha_hasta))
+        while True:
+            version = snapshot.version
+            with self._lock:
+                versions = self._versions.get(key)
+                if versions is not None and version in versions:
+                    self._versions.move_to_end(key)
+                    return version
+            hashes = snapshot.hashes()
+            if snapshot.version == version:
+                break
+            # Ha cambiado una fila mientras se calculaban los hashes
+
+        with self._lock:
+            versions = self._versions.setdefault(key, OrderedDict())
+            versions[version] = hashes
+            while len(versions) > self.max_versions:
+                versions.popitem(last=False)
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.max_entries * 2:
+                self._versions.popitem(last=False)
+        return version
+
+    def changes(self, snapshot, since):
+        """
+        Cambios del snapshot desde la versión `since` (de las mismas función y
+        fechas): (versión actual, ids añadidos o modificados, ids eliminados).
+        Devuelve None si esa versión no se conoce (demasiado antigua o de
+        otro proceso).
+        """
+        if not version_de_este_proceso(since):
+            return None
+        key = (snapshot.funcion, str(snapshot.fecha_desde), str(snapshot.fecha_hasta))
+        with self._lock:
+            previous = self._versions.get(key, {}).get(since)
+        if previous is None:
+            return None
+        version = self.register_version(snapshot)
+        with self._lock:
+            current = self._versions.get(key, {}).get(version)
+        if current is None:
+            current = snapshot.hashes()
+        changed = {k for k, h in current.items() if previous.get(k) != h}
+        removed = [k for k in previous if k not in current]
+        return version, changed, removed
+
+    def invalidate(self, funcion=None):
+        """Descarta los snapshots (todos o solo los de una función)."""
+        with self._lock:
+            for key in list(self._entries):
+                if funcion is None or key[0] == funcion:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'rows': sum(len(s) for s in self._entries.values()),
+                'max_entries': self.max_entries,
+                'max_rows': self.max_rows,
+                'registered_versions': sum(len(v) for v in self._versions.values()),
+                **self._stats,
+            }
+
+
+cache = SnapshotCache(
+    ttl=int(os.getenv('SNAPSHOT_TTL', '120')),
+    max_entries=int(os.getenv('SNAPSHOT_MAX_ENTRIES', '16')),
+    max_rows=int(os.getenv('SNAPSHOT_MAX_ROWS', '400000')),
+    max_versions=int(os.getenv('SNAPSHOT_MAX_VERSIONS', '8')),
+)
+
+
+def get_snapshot(funcion, fecha_desde, fecha_hasta):
+    """Snapshot compartido de una función para el rango de fechas."""
+    return cache.get(funcion, fecha_desde, fecha_hasta)
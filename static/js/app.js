@@ -13,6 +13,14 @@ let currentSearchData = null;
 let currentClickHandler = null;
 let savedLocationbutton = null;
 
+// Carga por vista (bbox + zoom): grupos por celda en zooms bajos
+let vistaLayer = null;
+let vistaTimer = null;
+let vistaPeticion = 0;
+
+// Capas de teselas vectoriales (/tiles/<capa>/{z}/{x}/{y}.mvt)
+let teselasLayers = [];
+
 // Variables para el sistema de zonas
 let isDrawingZone = false;
 let zonePoints = [];
@@ -473,15 +481,108 @@ async function fetchConTimeout(url, ms = 6000) {
     }
 }
 
-function buildUrlCampanasRecurso(noRecurso) {
-    const { fechaDesde, fechaHasta } = getFechasFormulario();
-    const params = new URLSearchParams();
-    params.append('no_recurso', noRecurso);
-    if (fechaDesde) params.append('fecha_desde', fechaDesde);
-    if (fechaHasta) params.append('fecha_hasta', fechaHasta);
-    return `/api/campanas?${params.toString()}`;
+// Cargador por id que agrupa en un solo POST en lote las peticiones que
+// llegan en la misma ventana corta (en lugar de una petición por popup).
+//   url: endpoint POST; campo: nombre de la lista de ids en el cuerpo;
+//   respuesta: nombre del objeto {id: resultado} de la respuesta;
+//   extra: parámetros adicionales del cuerpo (p. ej. las fechas del formulario)
+const LOTE_VENTANA_MS = 30;
+const LOTE_MAX_IDS = 200;
+const LOTE_CACHE_MS = 60000;
+
+function crearCargadorEnLote({ url, campo, respuesta, extra = () => ({}) }) {
+    const cache = new Map(); // 'extra|id' -> Promise
+    let pendientes = [];
+    let timer = null;
+    
+    async function enviar() {
+        clearTimeout(timer);
+        timer = null;
+        const lote = pendientes;
+        pendientes = [];
+        
+        // Normalmente todos con los mismos parámetros; si no, un POST por cada uno
+        const porExtra = new Map();
+        lote.forEach(p => {
+            if (!porExtra.has(p.extra)) porExtra.set(p.extra, []);
+            porExtra.get(p.extra).push(p);
+        });
+        
+        for (const [extraJson, grupo] of porExtra) {
+            try {
+                const cuerpo = JSON.parse(extraJson);
+                cuerpo[campo] = [...new Set(grupo.map(p => p.id))];
+                const response = await fetch(url, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(cuerpo)
+                });
+                if (!response.ok) {
+                    throw new Error(`Error HTTP ${response.status} en ${url}`);
+                }
+                const data = await response.json();
+                // El servidor agrupa los ids sin distinguir mayúsculas (como SQL Server)
+                const porId = new Map(
+                    Object.entries(data[respuesta] || {}).map(([id, valor]) => [id.toUpperCase(), valor])
+                );
+                grupo.forEach(p => {
+                    const resultado = porId.get(p.id.toUpperCase());
+                    if (resultado) {
+                        p.resolve(resultado);
+                    } else {
+                        p.reject(new Error(`Sin datos para ${p.id}`));
+                    }
+                });
+            } catch (error) {
+                grupo.forEach(p => p.reject(error));
+            }
+        }
+    }
+    
+    return function cargar(idOriginal) {
+        const id = String(idOriginal ?? '').trim();
+        const extraJson = JSON.stringify(extra());
+        const clave = `${extraJson}|${id}`;
+        if (cache.has(clave)) {
+            return cache.get(clave);
+        }
+        
+        const promesa = new Promise((resolve, reject) => {
+            pendientes.push({ id, extra: extraJson, resolve, reject });
+        });
+        cache.set(clave, promesa);
+        promesa.then(
+            () => setTimeout(() => cache.delete(clave), LOTE_CACHE_MS),
+            () => cache.delete(clave)
+        );
+        
+        if (pendientes.length >= LOTE_MAX_IDS) {
+            enviar();
+        } else if (!timer) {
+            timer = setTimeout(enviar, LOTE_VENTANA_MS);
+        }
+        return promesa;
+    };
 }
 
+// Incidencias y campañas del periodo de un recurso (POST /api/recursos/detalles)
+const cargarDetallesRecurso = crearCargadorEnLote({
+    url: '/api/recursos/detalles',
+    campo: 'recursos',
+    respuesta: 'recursos',
+    extra: () => {
+        const { fechaDesde, fechaHasta } = getFechasFormulario();
+        return { fecha_desde: fechaDesde || undefined, fecha_hasta: fechaHasta || undefined };
+    }
+});
+
+// Incidencias de un emplazamiento de mobiliario (POST /api/mobiliario/incidencias)
+const cargarIncidenciasMobiliario = crearCargadorEnLote({
+    url: '/api/mobiliario/incidencias',
+    campo: 'emplazamientos',
+    respuesta: 'emplazamientos'
+});
+
 // Función común para crear un popup completo de recurso con carga de detalles
 function crearPopupRecurso(marker, recurso) {
     // Almacenar datos del recurso
@@ -539,33 +640,9 @@ function crearPopupRecurso(marker, recurso) {
         marker.setPopupContent(loadingTooltip);
         
         try {
-            const urlCampanas = buildUrlCampanasRecurso(recurso.No_);
-            const { fechaDesde, fechaHasta } = getFechasFormulario();
-            let urlDetallesFull = `/api/recursos/${encodeURIComponent(recurso.No_)}/detalles`;
-            const detParams = new URLSearchParams();
-            if (fechaDesde) detParams.append('fecha_desde', fechaDesde);
-            if (fechaHasta) detParams.append('fecha_hasta', fechaHasta);
-            if (detParams.toString()) urlDetallesFull += '?' + detParams.toString();
-
-            const [responseDetalles, responseCampanas] = await Promise.all([
-                fetch(urlDetallesFull),
-                fetch(urlCampanas)
-            ]);
-
-            if (!responseDetalles.ok) {
-                throw new Error(`Error al cargar detalles: ${responseDetalles.status}`);
-            }
-
-            const dataDetalles = await responseDetalles.json();
-            let dataCampanas = { datos: [], total_registros: 0 };
-            if (responseCampanas.ok) {
-                dataCampanas = await responseCampanas.json();
-            } else {
-                console.warn(`⚠️ Error al cargar campañas: ${responseCampanas.status}`);
-            }
-
-            // Solo campañas filtradas por periodo (nunca el listado histórico de /detalles)
-            const campanas = Array.isArray(dataCampanas.datos) ? dataCampanas.datos : [];
+            // Incidencias y campañas del periodo (en lote con otros popups abiertos a la vez)
+            const dataDetalles = await cargarDetallesRecurso(recurso.No_);
+            const campanas = Array.isArray(dataDetalles.campanas) ? dataDetalles.campanas : [];
             const totalCampanas = campanas.length;
 
             let imagenBase64 = null;
@@ -806,6 +883,70 @@ async function exportarRecursosExcel() {
 }
 
 
+// Decodifica una lista en formato columnar (?format=columnar) a array de objetos:
+// {columnar, filas, columnas, valores: {col: [...]}, diccionarios: {col: [...]}}
+function decodeColumnar(col) {
+    const n = col.filas;
+    const columnas = col.columnas;
+    const arrays = columnas.map(c => {
+        const valores = col.valores[c];
+        const dict = col.diccionarios[c];
+        return dict ? valores.map(i => dict[i]) : valores;
+    });
+    const filas = new Array(n);
+    for (let i = 0; i < n; i++) {
+        const fila = {};
+        for (let j = 0; j < columnas.length; j++) {
+            fila[columnas[j]] = arrays[j][i];
+        }
+        filas[i] = fila;
+    }
+    return filas;
+}
+
+// Últimas respuestas por URL con su ETag: al repetir la petición se envía
+// If-None-Match y, si el servidor responde 304, se reutiliza el cuerpo guardado
+const respuestasConEtag = new Map();
+const MAX_RESPUESTAS_CON_ETAG = 20;
+
+async function fetchConValidador(url) {
+    const guardada = respuestasConEtag.get(url);
+    const opciones = guardada ? { headers: { 'If-None-Match': guardada.etag } } : {};
+    const response = await fetch(url, opciones);
+    
+    if (response.status === 304 && guardada) {
+        respuestasConEtag.delete(url);
+        respuestasConEtag.set(url, guardada);
+        return new Response(guardada.texto, { status: 200, headers: { 'Content-Type': guardada.tipo } });
+    }
+    
+    const etag = response.headers.get('ETag');
+    if (!response.ok || !etag) {
+        return response;
+    }
+    const tipo = response.headers.get('Content-Type') || 'application/json';
+    const texto = await response.text();
+    respuestasConEtag.delete(url);
+    respuestasConEtag.set(url, { etag: etag, texto: texto, tipo: tipo });
+    while (respuestasConEtag.size > MAX_RESPUESTAS_CON_ETAG) {
+        respuestasConEtag.delete(respuestasConEtag.keys().next().value);
+    }
+    return new Response(texto, { status: response.status, headers: { 'Content-Type': tipo } });
+}
+
+// Decodifica las listas columnar de una respuesta (las demás respuestas no cambian)
+function decodeColumnarResponse(data) {
+    if (data && data.formato === 'columnar') {
+        for (const clave of Object.keys(data)) {
+            const valor = data[clave];
+            if (valor && typeof valor === 'object' && valor.columnar === true) {
+                data[clave] = decodeColumnar(valor);
+            }
+        }
+    }
+    return data;
+}
+
 // Función auxiliar para añadir fechas y tipos de recurso a las URLs de las APIs
 function addFechasToUrl(url) {
     const fechaDesde = document.getElementById('fechaDesde').value;
@@ -823,6 +964,9 @@ function addFechasToUrl(url) {
     if (fechaDesde) params.append('fecha_desde', fechaDesde);
     if (fechaHasta) params.append('fecha_hasta', fechaHasta);
     
+    // Búsquedas "cerca": listas en formato columnar (más compacto)
+    if (url.includes('-cerca') && !params.has('format')) params.append('format', 'columnar');
+    
     // Añadir tipos de recurso y empresas seleccionados (solo para APIs de recursos, no mobiliario)
     if (url.includes('/api/recursos') && !url.includes('/api/mobiliario')) {
         const tiposRecursoSelect = document.getElementById('tiposRecurso');
@@ -866,146 +1010,54 @@ function addFechasToUrl(url) {
     return queryString ? `${baseUrl}?${queryString}` : baseUrl;
 }
 
-// Cargar empresas disponibles
-async function loadEmpresas() {
-    try {
-        const empresasSelect = document.getElementById('empresas');
-        if (!empresasSelect) return;
-        
-        // Limpiar opciones existentes
-        empresasSelect.innerHTML = '<option value="">Cargando empresas...</option>';
-        
-        // Construir URL con fechas (si no hay fechas, el backend usará la fecha de hoy)
-        const fechaDesde = document.getElementById('fechaDesde')?.value || '';
-        const fechaHasta = document.getElementById('fechaHasta')?.value || '';
-        
-        let url = '/api/empresas';
-        const params = new URLSearchParams();
-        
-        if (fechaDesde) params.append('fecha_desde', fechaDesde);
-        if (fechaHasta) params.append('fecha_hasta', fechaHasta);
-        
-        if (params.toString()) {
-            url += '?' + params.toString();
-        }
-        
-        const response = await fetch(url);
-        
-        if (!response.ok) {
-            throw new Error(`Error HTTP: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-            throw new Error(data.error);
-        }
-        
-        // Limpiar y añadir opciones
-        empresasSelect.innerHTML = '';
-        
-        if (data.empresas && data.empresas.length > 0) {
-            data.empresas.forEach(empresa => {
-                const option = document.createElement('option');
-                option.value = empresa;
-                option.textContent = empresa;
-                empresasSelect.appendChild(option);
-            });
-        } else {
+// Rellenar un desplegable de filtro con los valores de una faceta
+function rellenarSelectFaceta(select, valores, textoVacio) {
+    // Conservar la selección actual si los valores siguen existiendo
+    const seleccionados = new Set(Array.from(select.selectedOptions).map(option => option.value));
+    
+    select.innerHTML = '';
+    
+    if (valores && valores.length > 0) {
+        valores.forEach(faceta => {
             const option = document.createElement('option');
-            option.value = '';
-            option.textContent = 'No hay empresas disponibles';
-            empresasSelect.appendChild(option);
-        }
-        
-        console.log(`✅ Cargadas ${data.total || 0} empresas`);
-        
-    } catch (error) {
-        console.error('Error al cargar empresas:', error);
-        const empresasSelect = document.getElementById('empresas');
-        if (empresasSelect) {
-            empresasSelect.innerHTML = '<option value="">Error al cargar empresas</option>';
-        }
+            option.value = faceta.valor;
+            option.textContent = `${faceta.valor} (${faceta.total})`;
+            option.selected = seleccionados.has(faceta.valor);
+            select.appendChild(option);
+        });
+    } else {
+        const option = document.createElement('option');
+        option.value = '';
+        option.textContent = textoVacio;
+        select.appendChild(option);
     }
 }
 
-// Cargar familias disponibles
-async function loadFamilias() {
-    try {
-        const familiasSelect = document.getElementById('familias');
-        if (!familiasSelect) return;
-        
-        // Limpiar opciones existentes
-        familiasSelect.innerHTML = '<option value="">Cargando familias...</option>';
-        
-        // Construir URL con fechas (si no hay fechas, el backend usará la fecha de hoy)
-        const fechaDesde = document.getElementById('fechaDesde')?.value || '';
-        const fechaHasta = document.getElementById('fechaHasta')?.value || '';
-        
-        let url = '/api/familias';
-        const params = new URLSearchParams();
-        
-        if (fechaDesde) params.append('fecha_desde', fechaDesde);
-        if (fechaHasta) params.append('fecha_hasta', fechaHasta);
-        
-        if (params.toString()) {
-            url += '?' + params.toString();
-        }
-        
-        const response = await fetch(url);
-        
-        if (!response.ok) {
-            throw new Error(`Error HTTP: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-            throw new Error(data.error);
-        }
-        
-        // Limpiar y añadir opciones
-        familiasSelect.innerHTML = '';
-        
-        if (data.familias && data.familias.length > 0) {
-            data.familias.forEach(familia => {
-                const option = document.createElement('option');
-                option.value = familia;
-                option.textContent = familia;
-                familiasSelect.appendChild(option);
-            });
-        } else {
-            const option = document.createElement('option');
-            option.value = '';
-            option.textContent = 'No hay familias disponibles';
-            familiasSelect.appendChild(option);
-        }
-        
-        console.log(`✅ Cargadas ${data.total || 0} familias`);
-        
-    } catch (error) {
-        console.error('Error al cargar familias:', error);
-        const familiasSelect = document.getElementById('familias');
-        if (familiasSelect) {
-            familiasSelect.innerHTML = '<option value="">Error al cargar familias</option>';
+// Cargar tipos de recurso, empresas y familias disponibles (una sola petición)
+async function loadFacetas() {
+    const selects = {
+        tipos_recurso: document.getElementById('tiposRecurso'),
+        empresas: document.getElementById('empresas'),
+        familias: document.getElementById('familias')
+    };
+    const textos = {
+        tipos_recurso: ['Cargando tipos...', 'No hay tipos disponibles', 'Error al cargar tipos'],
+        empresas: ['Cargando empresas...', 'No hay empresas disponibles', 'Error al cargar empresas'],
+        familias: ['Cargando familias...', 'No hay familias disponibles', 'Error al cargar familias']
+    };
+    
+    Object.entries(selects).forEach(([clave, select]) => {
+        if (select && select.options.length === 0) {
+            select.innerHTML = `<option value="">${textos[clave][0]}</option>`;
         }
-    }
-}
-
-// Cargar tipos de recurso disponibles
-async function loadTiposRecurso() {
+    });
+    
     try {
-        const tiposSelect = document.getElementById('tiposRecurso');
-        if (!tiposSelect) return;
-        
-        // Limpiar opciones existentes
-        tiposSelect.innerHTML = '<option value="">Cargando tipos...</option>';
-        
         // Construir URL con fechas (si no hay fechas, el backend usará la fecha de hoy)
         const fechaDesde = document.getElementById('fechaDesde')?.value || '';
         const fechaHasta = document.getElementById('fechaHasta')?.value || '';
         
-        let url = '/api/tipos-recurso';
+        let url = '/api/facetas';
         const params = new URLSearchParams();
         
         if (fechaDesde) params.append('fecha_desde', fechaDesde);
@@ -1015,7 +1067,7 @@ async function loadTiposRecurso() {
             url += '?' + params.toString();
         }
         
-        const response = await fetch(url);
+        const response = await fetchConValidador(url);
         
         if (!response.ok) {
             throw new Error(`Error HTTP: ${response.status}`);
@@ -1027,31 +1079,19 @@ async function loadTiposRecurso() {
             throw new Error(data.error);
         }
         
-        // Limpiar y añadir opciones
-        tiposSelect.innerHTML = '';
-        
-        if (data.tipos_recurso && data.tipos_recurso.length > 0) {
-            data.tipos_recurso.forEach(tipo => {
-                const option = document.createElement('option');
-                option.value = tipo;
-                option.textContent = tipo;
-                tiposSelect.appendChild(option);
-            });
-        } else {
-            const option = document.createElement('option');
-            option.value = '';
-            option.textContent = 'No hay tipos disponibles';
-            tiposSelect.appendChild(option);
-        }
-        
-        console.log(`✅ Cargados ${data.total || 0} tipos de recurso`);
+        Object.entries(selects).forEach(([clave, select]) => {
+            if (!select) return;
+            rellenarSelectFaceta(select, data.facetas[clave], textos[clave][1]);
+            console.log(`✅ Cargados ${(data.facetas[clave] || []).length} valores de ${clave}`);
+        });
         
     } catch (error) {
-        console.error('Error al cargar tipos de recurso:', error);
-        const tiposSelect = document.getElementById('tiposRecurso');
-        if (tiposSelect) {
-            tiposSelect.innerHTML = '<option value="">Error al cargar tipos</option>';
-        }
+        console.error('Error al cargar facetas:', error);
+        Object.entries(selects).forEach(([clave, select]) => {
+            if (select) {
+                select.innerHTML = `<option value="">${textos[clave][2]}</option>`;
+            }
+        });
     }
 }
 
@@ -1098,11 +1138,224 @@ function initMap() {
     console.log('✅ Mapa inicializado correctamente');
 }
 
+// ¿Está activado "Cargar solo la vista actual"?
+function modoVistaActivo() {
+    const check = document.getElementById('modoVista');
+    return !!(check && check.checked);
+}
+
+// Parámetros bbox (oeste,sur,este,norte) y zoom de la vista actual del mapa
+function parametrosVista() {
+    const bounds = map.getBounds();
+    const bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+        .map(v => v.toFixed(6))
+        .join(',');
+    return { bbox: bbox, zoom: map.getZoom() };
+}
+
+// Marcador de un grupo de elementos (número de elementos; clic = acercar)
+function crearMarcadorGrupo(grupo, tipo) {
+    const tamano = Math.min(56, 26 + Math.round(Math.log10(grupo.total) * 10));
+    const color = tipo === 'mobiliario' ? '#17a2b8' : '#28a745';
+    const icon = L.divIcon({
+        className: 'marcador-grupo',
+        html: `<div style="width:${tamano}px;height:${tamano}px;line-height:${tamano}px;border-radius:50%;` +
+              `background:${color};opacity:0.85;color:#fff;font-weight:bold;font-size:12px;text-align:center;` +
+              `border:2px solid #fff;box-shadow:0 0 4px rgba(0,0,0,0.4);">${grupo.total}</div>`,
+        iconSize: [tamano, tamano],
+        iconAnchor: [tamano / 2, tamano / 2]
+    });
+    const marker = L.marker([grupo.lat, grupo.lon], { icon: icon });
+    let texto = `${grupo.total} ${tipo === 'mobiliario' ? 'elementos de mobiliario' : 'recursos'}`;
+    if (grupo.incidencias != null) texto += `<br>Incidencias: ${grupo.incidencias}`;
+    if (grupo.campanas != null) texto += `<br>Campañas: ${grupo.campanas}`;
+    marker.bindTooltip(texto);
+    marker.on('click', () => {
+        map.setView([grupo.lat, grupo.lon], Math.min(map.getZoom() + 2, map.getMaxZoom()));
+    });
+    return marker;
+}
+
+// Cargar recursos y mobiliario de la vista actual: el servidor devuelve
+// grupos por celda por debajo de su zoom de puntos y puntos individuales a partir de él
+async function loadVistaActual() {
+    const statusDiv = document.getElementById('status');
+    const peticion = ++vistaPeticion;
+    
+    try {
+        statusDiv.textContent = 'Cargando la vista actual...';
+        statusDiv.className = 'status';
+        
+        const vista = parametrosVista();
+        const params = new URLSearchParams();
+        const fechaDesde = document.getElementById('fechaDesde').value;
+        const fechaHasta = document.getElementById('fechaHasta').value;
+        if (fechaDesde) params.append('fecha_desde', fechaDesde);
+        if (fechaHasta) params.append('fecha_hasta', fechaHasta);
+        params.append('bbox', vista.bbox);
+        params.append('zoom', vista.zoom);
+        params.append('format', 'columnar');
+        
+        const [recursosResponse, mobiliarioResponse] = await Promise.all([
+            fetchConValidador('/api/recursos?' + params.toString()),
+            fetchConValidador('/api/mobiliario?' + params.toString())
+        ]);
+        if (!recursosResponse.ok || !mobiliarioResponse.ok) {
+            throw new Error(`Error HTTP: ${recursosResponse.status} / ${mobiliarioResponse.status}`);
+        }
+        const recursosData = decodeColumnarResponse(await recursosResponse.json());
+        const mobiliarioData = decodeColumnarResponse(await mobiliarioResponse.json());
+        
+        // Si entretanto se ha movido el mapa, esta respuesta ya no vale
+        if (peticion !== vistaPeticion || !modoVistaActivo()) return;
+        
+        const nuevaCapa = L.layerGroup();
+        (recursosData.grupos || []).forEach(grupo => nuevaCapa.addLayer(crearMarcadorGrupo(grupo, 'recursos')));
+        (mobiliarioData.grupos || []).forEach(grupo => nuevaCapa.addLayer(crearMarcadorGrupo(grupo, 'mobiliario')));
+        
+        recursosDataMap.clear();
+        const posicionesMap = calcularPosicionesMarcadoresSeparados(recursosData.datos || []);
+        (recursosData.datos || []).forEach(recurso => {
+            const pos = posicionesMap.get(String(recurso.No_ ?? ''));
+            const marker = crearMarcadorRecurso(recurso, pos);
+            if (marker) nuevaCapa.addLayer(marker);
+        });
+        (mobiliarioData.datos || []).forEach(mobiliario => {
+            const marker = crearMarcadorMobiliario(mobiliario);
+            if (marker) nuevaCapa.addLayer(marker);
+        });
+        
+        if (vistaLayer) map.removeLayer(vistaLayer);
+        vistaLayer = nuevaCapa.addTo(map);
+        
+        const modo = recursosData.modo === 'grupos' ? 'agrupados' : 'individuales';
+        statusDiv.textContent = `✓ Vista actual: ${recursosData.total_registros} recursos + ` +
+            `${mobiliarioData.total_registros} mobiliario (${modo})`;
+        statusDiv.className = 'status success';
+    } catch (error) {
+        console.error('Error al cargar la vista actual:', error);
+        statusDiv.textContent = `✗ Error: ${error.message}`;
+        statusDiv.className = 'status error';
+    }
+}
+
+// Recargar la vista al mover o hacer zoom (con espera para no pedir en cada paso)
+function programarCargaVista() {
+    if (!modoVistaActivo() || !vistaLayer) return;
+    clearTimeout(vistaTimer);
+    vistaTimer = setTimeout(loadVistaActual, 300);
+}
+
+// ¿Está activado "Usar teselas vectoriales"?
+function modoTeselasActivo() {
+    const check = document.getElementById('modoTeselas');
+    return !!(check && check.checked);
+}
+
+// Estilo de los puntos de las teselas según la capa y si tienen incidencias
+function estiloPuntoTesela(capa) {
+    return function(properties, zoom) {
+        const conIncidencia = Number(properties.incidencia) > 0;
+        return {
+            radius: zoom < 12 ? 3 : 6,
+            fill: true,
+            fillColor: conIncidencia ? '#dc3545' : (capa === 'mobiliario' ? '#17a2b8' : '#28a745'),
+            fillOpacity: 0.8,
+            color: '#ffffff',
+            weight: 1
+        };
+    };
+}
+
+// Cargar recursos y mobiliario como teselas vectoriales: el navegador solo
+// pide (y guarda en su caché) las teselas que se ven al mover el mapa
+function loadTeselasVectoriales() {
+    const statusDiv = document.getElementById('status');
+    if (!L.vectorGrid) {
+        statusDiv.textContent = '✗ Error: Leaflet.VectorGrid no está disponible';
+        statusDiv.className = 'status error';
+        return;
+    }
+    
+    const params = new URLSearchParams();
+    const fechaDesde = document.getElementById('fechaDesde').value;
+    const fechaHasta = document.getElementById('fechaHasta').value;
+    if (fechaDesde) params.append('fecha_desde', fechaDesde);
+    if (fechaHasta) params.append('fecha_hasta', fechaHasta);
+    const query = params.toString() ? '?' + params.toString() : '';
+    
+    teselasLayers = ['recursos', 'mobiliario'].map(capa => {
+        const estilos = {};
+        estilos[capa] = estiloPuntoTesela(capa);
+        const layer = L.vectorGrid.protobuf(`/tiles/${capa}/{z}/{x}/{y}.mvt${query}`, {
+            vectorTileLayerStyles: estilos,
+            interactive: true,
+            maxNativeZoom: 18
+        });
+        layer.on('click', e => {
+            const p = e.layer.properties || {};
+            let html = `<b>${p.nombre || p.id || ''}</b><br>${capa === 'mobiliario' ? 'Emplazamiento' : 'Recurso'}: ${p.id || ''}`;
+            if (p.tipo) html += `<br>Tipo: ${p.tipo}`;
+            if (p.empresa) html += `<br>Empresa: ${p.empresa}`;
+            if (p.incidencia != null) html += `<br>Incidencias: ${p.incidencia}`;
+            if (p.campanas != null) html += `<br>Campañas: ${p.campanas}`;
+            L.popup().setLatLng(e.latlng).setContent(html).openOn(map);
+        });
+        return layer.addTo(map);
+    });
+    
+    statusDiv.textContent = '✓ Teselas vectoriales de recursos y mobiliario activas';
+    statusDiv.className = 'status success';
+}
+
+// Última lista completa de /api/recursos y /api/mobiliario con su versión:
+// al recargar con los mismos parámetros solo se piden los cambios (/cambios?since=)
+const datosSincronizados = new Map();
+
+async function cargarConCambios(ruta, query, campoId, nombre) {
+    const previo = datosSincronizados.get(ruta);
+    const incremental = previo && previo.query === query && previo.version != null;
+    const url = incremental
+        ? `${ruta}/cambios?${query}&since=${encodeURIComponent(previo.version)}`
+        : `${ruta}?${query}`;
+    
+    const response = await fetchConValidador(url);
+    if (!response.ok) {
+        throw new Error(`Error HTTP en ${nombre}: ${response.status}`);
+    }
+    const data = decodeColumnarResponse(await response.json());
+    if (data.error) {
+        throw new Error(`Error en ${nombre}: ${data.error}`);
+    }
+    
+    if (incremental && !data.completo) {
+        const idDe = item => String(item[campoId] ?? '').trim();
+        const quitar = new Set(data.eliminados.map(id => String(id).trim()));
+        data.datos.forEach(item => quitar.add(idDe(item)));
+        data.datos = previo.datos.filter(item => !quitar.has(idDe(item))).concat(data.datos);
+        data.total_registros = data.datos.length;
+        console.log(`🔄 ${nombre}: ${quitar.size} cambios desde la versión ${previo.version}`);
+    }
+    datosSincronizados.set(ruta, { query: query, version: data.version, datos: data.datos });
+    return data;
+}
+
 // Cargar todos los datos geoespaciales desde la API
 async function loadAllGeoData() {
     const statusDiv = document.getElementById('status');
     const loadButton = document.getElementById('loadAllData');
     
+    if (modoTeselasActivo()) {
+        clearMap();
+        loadTeselasVectoriales();
+        return;
+    }
+    if (modoVistaActivo()) {
+        clearMap();
+        await loadVistaActual();
+        return;
+    }
+    
     try {
         statusDiv.textContent = 'Cargando todos los datos...';
         statusDiv.className = 'status';
@@ -1115,39 +1368,20 @@ async function loadAllGeoData() {
         const fechaDesde = document.getElementById('fechaDesde').value;
         const fechaHasta = document.getElementById('fechaHasta').value;
         
-        // Construir URLs con parámetros de fecha si existen
-        let recursosUrl = '/api/recursos';
-        let mobiliarioUrl = '/api/mobiliario';
+        // Construir parámetros de fecha si existen
         const params = new URLSearchParams();
         
         if (fechaDesde) params.append('fecha_desde', fechaDesde);
         if (fechaHasta) params.append('fecha_hasta', fechaHasta);
+        // Formato columnar: claves una sola vez y Empresa/Tipo como diccionario
+        params.append('format', 'columnar');
         
-        if (params.toString()) {
-            recursosUrl += '?' + params.toString();
-            mobiliarioUrl += '?' + params.toString();
-        }
-        
-        // Cargar recursos y mobiliario en paralelo
-        const [recursosResponse, mobiliarioResponse] = await Promise.all([
-            fetch(recursosUrl),
-            fetch(mobiliarioUrl)
+        // Cargar recursos y mobiliario en paralelo (solo los cambios si ya se tenían)
+        const [recursosData, mobiliarioData] = await Promise.all([
+            cargarConCambios('/api/recursos', params.toString(), 'No_', 'recursos'),
+            cargarConCambios('/api/mobiliario', params.toString(), 'Nº Emplazamiento', 'mobiliario')
         ]);
         
-        if (!recursosResponse.ok || !mobiliarioResponse.ok) {
-            throw new Error(`Error HTTP: ${recursosResponse.status} / ${mobiliarioResponse.status}`);
-        }
-        
-        const recursosData = await recursosResponse.json();
-        const mobiliarioData = await mobiliarioResponse.json();
-        
-        if (recursosData.error) {
-            throw new Error(`Error en recursos: ${recursosData.error}`);
-        }
-        if (mobiliarioData.error) {
-            throw new Error(`Error en mobiliario: ${mobiliarioData.error}`);
-        }
-        
         // Cargar recursos
         await loadRecursosData(recursosData);
         
@@ -1783,14 +2017,8 @@ async function cargarMobiliarioPopupDetalle(marker, mobiliario) {
     marker.setPopupContent(loadingTooltip);
 
     try {
-        const response = await fetch(`/api/mobiliario/${mobiliario['Nº Emplazamiento']}/incidencias`);
-        if (!response.ok) {
-            throw new Error(`Error al obtener incidencias: ${response.status}`);
-        }
-        const data = await response.json();
-        if (!data.success) {
-            throw new Error(data.error || 'Error al obtener incidencias');
-        }
+        // En lote con los demás popups de mobiliario que se abran a la vez
+        const data = await cargarIncidenciasMobiliario(mobiliario['Nº Emplazamiento']);
 
         const ubicacionHtml = await buildUbicacionStreetViewHtmlAsync({
             lat: mobiliario.PuntoY,
@@ -1809,7 +2037,7 @@ async function cargarMobiliarioPopupDetalle(marker, mobiliario) {
                 <p><strong>Nº Emplazamiento:</strong> ${mobiliario['Nº Emplazamiento']}</p>
                 <p><strong>Tipo:</strong> ${mobiliario.Tipo || 'N/A'}</p>
                 ${buildMobiliarioCamposHtml(mobiliario)}
-                ${mobiliario.geocodificado ? '<p><strong>📍 Ubicación:</strong> <em>Geocodificada desde dirección de Mallorca</em></p>' : ''}
+                ${mobiliario.geocodificado === true ? '<p><strong>📍 Ubicación:</strong> <em>Geocodificada desde dirección de Mallorca</em></p>' : ''}
                 <hr style="margin:8px 0;border-color:#ddd;">
                 <p><strong>Estado:</strong> ${getMobiliarioEstadoTexto(mobiliario)}</p>
                 <p><strong>Total incidencias:</strong> ${data.total_incidencias || 0}</p>
@@ -1933,6 +2161,8 @@ async function loadRecursos() {
         
         if (fechaDesde) params.append('fecha_desde', fechaDesde);
         if (fechaHasta) params.append('fecha_hasta', fechaHasta);
+        // Formato columnar: claves una sola vez y Empresa/Tipo como diccionario
+        params.append('format', 'columnar');
         
         // Añadir tipos de recurso seleccionados
         const tiposRecursoSelect = document.getElementById('tiposRecurso');
@@ -1976,13 +2206,13 @@ async function loadRecursos() {
         
         console.log(`🔗 URL de petición: ${url}`);
         
-        const response = await fetch(url);
+        const response = await fetchConValidador(url);
         
         if (!response.ok) {
             throw new Error(`Error HTTP: ${response.status}`);
         }
         
-        const data = await response.json();
+        const data = decodeColumnarResponse(await response.json());
         
         if (data.error) {
             throw new Error(data.error);
@@ -2051,18 +2281,20 @@ async function loadMobiliario() {
         
         if (fechaDesde) params.append('fecha_desde', fechaDesde);
         if (fechaHasta) params.append('fecha_hasta', fechaHasta);
+        // Formato columnar: claves una sola vez y Empresa/Tipo como diccionario
+        params.append('format', 'columnar');
         
         if (params.toString()) {
             url += '?' + params.toString();
         }
         
-        const response = await fetch(url);
+        const response = await fetchConValidador(url);
         
         if (!response.ok) {
             throw new Error(`Error HTTP: ${response.status}`);
         }
         
-        const data = await response.json();
+        const data = decodeColumnarResponse(await response.json());
         
         if (data.error) {
             throw new Error(data.error);
@@ -2179,6 +2411,13 @@ function clearMap() {
         }
         mobiliarioLayer = null;
     }
+    if (vistaLayer) {
+        map.removeLayer(vistaLayer);
+        vistaLayer = null;
+    }
+    teselasLayers.forEach(layer => map.removeLayer(layer));
+    teselasLayers = [];
+    clearTimeout(vistaTimer);
     
     // Limpiar resultados de búsqueda
     clearSearchResults();
@@ -2232,24 +2471,18 @@ document.addEventListener('DOMContentLoaded', function() {
     // Inicializar contador de seleccionados
     updateContadorSeleccionados();
     
-    // Cargar tipos de recurso y empresas al iniciar
-    loadTiposRecurso();
-    loadEmpresas();
-    loadFamilias();
+    // Cargar tipos de recurso, empresas y familias al iniciar
+    loadFacetas();
     
     // Recargar tipos, empresas y familias cuando cambien las fechas
     if (fechaDesde) {
         fechaDesde.addEventListener('change', () => {
-            loadTiposRecurso();
-            loadEmpresas();
-            loadFamilias();
+            loadFacetas();
         });
     }
     if (fechaHasta) {
         fechaHasta.addEventListener('change', () => {
-            loadTiposRecurso();
-            loadEmpresas();
-            loadFamilias();
+            loadFacetas();
         });
     }
     // Inicializar el mapa cuando se carga la página
@@ -2277,6 +2510,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Event listeners para los botones principales
     document.getElementById('loadAllData').addEventListener('click', loadAllGeoData);
+    map.on('moveend', programarCargaVista);
     document.getElementById('loadRecursos').addEventListener('click', loadRecursos);
     document.getElementById('loadMobiliario').addEventListener('click', loadMobiliario);
     document.getElementById('clearMap').addEventListener('click', clearMap);
@@ -2459,7 +2693,7 @@ async function searchByPlace() {
                 
                 const url = addFechasToUrl(`/api/recursos-cerca-lugares?lat=${savedLocation.lat}&lon=${savedLocation.lon}&tipo_lugar=${placeType}&radio=${radius}`);
                 const response = await fetch(url);
-                const data = await response.json();
+                const data = decodeColumnarResponse(await response.json());
                 
                 if (data.error) {
                     throw new Error(data.error);
@@ -2501,7 +2735,7 @@ async function searchByPlace() {
             
             const url = addFechasToUrl(`/api/recursos-cerca-lugares?lat=${lat}&lon=${lon}&tipo_lugar=${placeType}&radio=${radius}`);
             const response = await fetch(url);
-            const data = await response.json();
+            const data = decodeColumnarResponse(await response.json());
             
             if (data.error) {
                 throw new Error(data.error);
@@ -2554,7 +2788,7 @@ async function searchByCoordinates() {
         
         const url = addFechasToUrl(`/api/recursos-cerca-coordenadas?lat=${lat}&lon=${lon}&radio=${radius}`);
         const response = await fetch(url);
-        const data = await response.json();
+        const data = decodeColumnarResponse(await response.json());
         
         if (data.error) {
             throw new Error(data.error);
@@ -2622,7 +2856,7 @@ async function executeAddressSearch(originalAddress, radius, lat, lon, formatted
     url = addFechasToUrl(url);
 
     const response = await fetch(url);
-    const data = await response.json();
+    const data = decodeColumnarResponse(await response.json());
 
     if (data.error) {
         throw new Error(data.error);
@@ -2693,7 +2927,7 @@ async function searchMobiliarioNearPoint(lat, lon, radius, searchType, extraPara
 
     const url = addFechasToUrl(`/api/mobiliario-cerca-coordenadas?lat=${lat}&lon=${lon}&radio=${radius}`);
     const response = await fetch(url);
-    const data = await response.json();
+    const data = decodeColumnarResponse(await response.json());
 
     if (data.error) {
         throw new Error(data.error);
@@ -2814,7 +3048,7 @@ async function executeMobiliarioAddressSearch(originalAddress, radius, lat, lon,
     url = addFechasToUrl(url);
 
     const response = await fetch(url);
-    const data = await response.json();
+    const data = decodeColumnarResponse(await response.json());
 
     if (data.error) {
         throw new Error(data.error);
@@ -3229,7 +3463,7 @@ async function performPlaceSearch(lat, lon) {
         
         const url = addFechasToUrl(`/api/recursos-cerca-lugares?lat=${lat}&lon=${lon}&tipo_lugar=${placeType}&radio=${radius}`);
         const response = await fetch(url);
-        const data = await response.json();
+        const data = decodeColumnarResponse(await response.json());
         
         if (data.error) {
             throw new Error(data.error);
@@ -3634,28 +3868,28 @@ function setupMapClickSearch() {
                 case '1':
                     // Búsqueda por coordenadas
                     response = await fetch(addFechasToUrl(`/api/recursos-cerca-coordenadas?lat=${lat}&lon=${lon}&radio=${searchRadius}`));
-                    data = await response.json();
+                    data = decodeColumnarResponse(await response.json());
                     displaySearchResults(data, 'coordinates', { lat, lon, radius: searchRadius });
                     break;
                     
                 case '2':
                     // Búsqueda por hospitales
                     response = await fetch(addFechasToUrl(`/api/recursos-cerca-lugares?lat=${lat}&lon=${lon}&tipo_lugar=hospital&radio=${searchRadius}`));
-                    data = await response.json();
+                    data = decodeColumnarResponse(await response.json());
                     displaySearchResults(data, 'place', { lat, lon, radius: searchRadius });
                     break;
                     
                 case '3':
                     // Búsqueda por farmacias
                     response = await fetch(addFechasToUrl(`/api/recursos-cerca-lugares?lat=${lat}&lon=${lon}&tipo_lugar=pharmacy&radio=${searchRadius}`));
-                    data = await response.json();
+                    data = decodeColumnarResponse(await response.json());
                     displaySearchResults(data, 'place', { lat, lon, radius: searchRadius });
                     break;
                     
                 case '4':
                     // Búsqueda por gasolineras
                     response = await fetch(addFechasToUrl(`/api/recursos-cerca-lugares?lat=${lat}&lon=${lon}&tipo_lugar=gas_station&radio=${searchRadius}`));
-                    data = await response.json();
+                    data = decodeColumnarResponse(await response.json());
                     displaySearchResults(data, 'place', { lat, lon, radius: searchRadius });
                     break;
                     
@@ -4673,7 +4907,7 @@ async function searchByZone() {
         
         // Obtener todos los recursos
         const url = addFechasToUrl('/api/recursos');
-        const response = await fetch(url);
+        const response = await fetchConValidador(url);
         const data = await response.json();
         
         if (data.error) {
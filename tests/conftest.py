@@ -0,0 +1,35 @@
+"""
+Configuración común de las pruebas.
+
+Las pruebas no usan SQL Server: los módulos que importan pyodbc reciben
+conexiones y cursores falsos. Si el driver ODBC del sistema no está
+instalado (import pyodbc falla), se registra un módulo pyodbc mínimo con las
+clases que usa config/database.py para que se pueda importar.
+"""
+import os
+import sys
+import types
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    pyodbc = types.ModuleType('pyodbc')
+
+    class Error(Exception):
+        pass
+
+    class ProgrammingError(Error):
+        pass
+
+    def connect(*args, **kwargs):
+        raise Error("pyodbc no disponible en las pruebas")
+
+    pyodbc.Error = Error
+    pyodbc.ProgrammingError = ProgrammingError
+    pyodbc.Connection = object
+    pyodbc.connect = connect
+    sys.modules['pyodbc'] = pyodbc
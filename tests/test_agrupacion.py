@@ -0,0 +1,37 @@
+"""Agrupación en rejilla de los puntos del mapa."""
+import math
+
+from agrupacion import agrupar, tamano_celda
+
+
+def test_sin_puntos():
+    grupos, etiquetas = agrupar([], [], 10)
+    assert grupos == [] and len(etiquetas) == 0
+
+
+def test_puntos_cercanos_en_un_grupo_y_lejanos_en_otro():
+    # Los dos primeros en la misma posición (misma celda seguro), el tercero a un grado
+    lats = [39.57, 39.57, 40.57]
+    lons = [2.65, 2.65, 2.65]
+
+    grupos, etiquetas = agrupar(lats, lons, 10, pesos={'incidencias': [1, 2, 5]})
+
+    assert len(grupos) == 2
+    assert etiquetas[0] == etiquetas[1] != etiquetas[2]
+    juntos = grupos[etiquetas[0]]
+    assert juntos == {'lat': 39.57, 'lon': 2.65, 'total': 2, 'incidencias': 3}
+    solo = grupos[etiquetas[2]]
+    assert solo['total'] == 1 and solo['incidencias'] == 5
+
+
+def test_el_grupo_esta_en_el_centroide():
+    _, dlon = tamano_celda(18, 39.57)
+    # Dos puntos cerca del centro de la misma celda de longitud
+    lon = (math.floor(2.65 / dlon) + 0.5) * dlon
+    grupos, _ = agrupar([39.57, 39.57], [lon, lon + dlon / 10], 18)
+    assert len(grupos) == 1
+    assert grupos[0]['lon'] == round(lon + dlon / 20, 6)
+
+
+def test_mas_zoom_celdas_mas_pequenas():
+    assert tamano_celda(14, 39.5)[0] < tamano_celda(10, 39.5)[0]
@@ -0,0 +1,66 @@
+"""CacheIncidenciasUsuario: espera acotada e invalidación durante una carga."""
+import threading
+
+from cache_incidencias_usuario import CacheIncidenciasUsuario
+
+
+def test_acierto_tras_la_primera_carga():
+    cargas = []
+
+    def cargar(usuario):
+        cargas.append(usuario)
+        return {'R1': [{'No': 'INC1'}]}
+
+    cache = CacheIncidenciasUsuario(cargar)
+    assert cache.incidencias('u1', 'R1') == [{'No': 'INC1'}]
+    assert cache.incidencias(' u1 ', 'R2') == []
+    assert cargas == ['u1']
+    assert cache.stats()['hits'] == 1
+
+
+def test_error_de_carga_devuelve_none():
+    def cargar(usuario):
+        raise RuntimeError("BC no responde")
+
+    cache = CacheIncidenciasUsuario(cargar)
+    assert cache.incidencias('u1', 'R1') is None
+    assert cache.stats()['errors'] == 1
+
+
+def test_carga_lenta_devuelve_none_y_sigue_en_segundo_plano():
+    liberar = threading.Event()
+
+    def cargar(usuario):
+        liberar.wait(5)
+        return {'R1': ['INC1']}
+
+    cache = CacheIncidenciasUsuario(cargar, espera_maxima=0.05)
+    assert cache.incidencias('u1', 'R1') is None
+    assert cache.stats()['timeouts'] == 1
+
+    liberar.set()
+    cache._cargas['u1'].result(timeout=5)
+    assert cache.incidencias('u1', 'R1') == ['INC1']
+
+
+def test_invalidar_descarta_la_carga_en_curso():
+    liberar = threading.Event()
+    respuestas = iter([{'R1': ['ANTIGUA']}, {'R1': ['ANTIGUA', 'NUEVA']}])
+
+    def cargar(usuario):
+        respuesta = next(respuestas)
+        if 'NUEVA' not in respuesta['R1']:
+            liberar.wait(5)
+        return respuesta
+
+    cache = CacheIncidenciasUsuario(cargar, espera_maxima=0.05)
+    assert cache.incidencias('u1', 'R1') is None
+    antigua = cache._cargas['u1']
+
+    cache.invalidar('u1')
+    assert cache.incidencias('u1', 'R1') == ['ANTIGUA', 'NUEVA']
+
+    liberar.set()
+    assert antigua.result(timeout=5) is None
+    assert cache.incidencias('u1', 'R1') == ['ANTIGUA', 'NUEVA']
+    assert cache.stats()['descartadas'] == 1
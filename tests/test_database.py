@@ -0,0 +1,132 @@
+"""Pool de conexiones con conexiones falsas (sin SQL Server)."""
+import threading
+
+import pyodbc
+import pytest
+
+from config.database import ConnectionPool
+
+
+class CursorFalso:
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def execute(self, sql, *params):
+        if not self._conexion.sana:
+            raise pyodbc.Error("conexión rota")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self, numero):
+        self.numero = numero
+        self.sana = True
+        self.cerrada = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.cerrada = True
+
+
+@pytest.fixture
+def abiertas():
+    return []
+
+
+@pytest.fixture
+def pool(abiertas):
+    def conectar():
+        conexion = ConexionFalsa(len(abiertas) + 1)
+        abiertas.append(conexion)
+        return conexion
+
+    return ConnectionPool(connect=conectar, max_size=2, health_check_after=0, acquire_timeout=0.2)
+
+
+def test_prestar_y_devolver_reutiliza_la_conexion(pool, abiertas):
+    conn = pool.acquire()
+    assert pool.stats()['in_use'] == 1
+    conn.close()
+
+    stats = pool.stats()
+    assert stats['in_use'] == 0 and stats['idle'] == 1
+    assert abiertas[0].rollbacks == 1  # al devolverla se deshace lo no confirmado
+
+    with pool.connection() as otra:
+        assert otra.numero == 1
+    assert len(abiertas) == 1
+    assert pool.stats()['reused'] == 1
+
+
+def test_conexion_devuelta_no_se_puede_usar(pool):
+    conn = pool.acquire()
+    conn.close()
+    conn.close()  # idempotente
+    with pytest.raises(pyodbc.ProgrammingError):
+        conn.cursor()
+    assert pool.stats()['in_use'] == 0
+
+
+def test_invalidar_descarta_la_conexion(pool, abiertas):
+    conn = pool.acquire()
+    conn.invalidate()
+
+    stats = pool.stats()
+    assert stats['idle'] == 0 and stats['in_use'] == 0 and stats['discarded'] == 1
+    assert abiertas[0].cerrada
+
+    with pool.connection() as nueva:
+        assert nueva.numero == 2
+
+
+def test_error_de_pyodbc_en_el_with_invalida(pool, abiertas):
+    with pytest.raises(pyodbc.Error):
+        with pool.connection():
+            raise pyodbc.Error("fallo de red")
+    assert abiertas[0].cerrada
+    assert pool.stats()['discarded'] == 1
+
+
+def test_otros_errores_devuelven_la_conexion(pool, abiertas):
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("error de la aplicación")
+    assert not abiertas[0].cerrada
+    assert pool.stats()['idle'] == 1
+
+
+def test_conexion_rota_se_descarta_al_prestarla(pool, abiertas):
+    pool.acquire().close()
+    abiertas[0].sana = False
+
+    with pool.connection() as conn:
+        assert conn.numero == 2
+    assert pool.stats()['health_check_failures'] == 1
+    assert abiertas[0].cerrada
+
+
+def test_pool_agotado_espera_y_agota_el_tiempo(pool):
+    a = pool.acquire()
+    b = pool.acquire()
+    numero_a = a.numero
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+    # Al devolver una, el que espera la recibe
+    threading.Timer(0.05, a.close).start()
+    c = pool.acquire(timeout=2)
+    assert c.numero == numero_a
+    b.close()
+    c.close()
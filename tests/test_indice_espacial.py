@@ -0,0 +1,65 @@
+"""IndiceEspacial: candidatos por rectángulo y por radio, también tras actualizar filas."""
+from indice_espacial import IndiceEspacial
+from snapshots import RECURSOS, Snapshot
+
+DESCRIPCION = [('No_', str), ('PuntoX', float), ('PuntoY', float)]
+
+
+def _snapshot():
+    filas = [
+        ('R1', 2.6500, 39.5700),  # Palma
+        ('R2', 2.6510, 39.5705),  # a unos 100 m
+        ('R3', 3.0000, 39.8000),  # lejos
+        ('R4', 0, 0),             # sin coordenadas
+    ]
+    return Snapshot(RECURSOS, '2024-01-01', '2024-01-31', DESCRIPCION, filas)
+
+
+def _indice(snapshot):
+    return snapshot.derived('indice', IndiceEspacial.desde_snapshot)
+
+
+def test_solo_se_indexan_filas_con_coordenadas():
+    assert len(_indice(_snapshot())) == 3
+
+
+def test_candidatos_bbox_exactos():
+    indice = _indice(_snapshot())
+    assert sorted(indice.candidatos_bbox(39.56, 2.64, 39.58, 2.66)) == [0, 1]
+    assert indice.candidatos_bbox(39.5702, 2.6505, 39.58, 2.66) == [1]
+
+
+def test_candidatos_radio():
+    indice = _indice(_snapshot())
+    assert sorted(indice.candidatos_radio(39.57, 2.65, 1)) == [0, 1]
+    assert sorted(indice.candidatos_radio(39.57, 2.65, 50)) == [0, 1, 2]
+
+
+def test_update_row_mueve_la_fila():
+    snapshot = _snapshot()
+    indice = _indice(snapshot)
+
+    snapshot.update_row(2, {'PuntoX': 2.6502, 'PuntoY': 39.5701})
+
+    assert sorted(indice.candidatos_radio(39.57, 2.65, 1)) == [0, 1, 2]
+    assert indice.candidatos_bbox(39.79, 2.99, 39.81, 3.01) == []
+
+
+def test_update_row_geocodifica_una_fila_sin_coordenadas():
+    snapshot = _snapshot()
+    indice = _indice(snapshot)
+
+    snapshot.update_row(3, {'PuntoX': 2.6503, 'PuntoY': 39.5702})
+
+    assert len(indice) == 4
+    assert 3 in indice.candidatos_radio(39.57, 2.65, 1)
+
+
+def test_update_row_sin_coordenadas_quita_la_fila():
+    snapshot = _snapshot()
+    indice = _indice(snapshot)
+
+    snapshot.update_row(0, {'PuntoX': 0, 'PuntoY': 0})
+
+    assert len(indice) == 2
+    assert indice.candidatos_radio(39.57, 2.65, 1) == [1]
@@ -0,0 +1,159 @@
+"""Teselas MVT: se decodifican con un lector de protobuf mínimo y se comprueba el contenido."""
+import struct
+
+from mvt import EXTENT, codificar_capa, codificar_tesela, proyectar, CacheTeselas
+
+
+def _leer_varint(datos, pos):
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = datos[pos]
+        pos += 1
+        valor |= (byte & 0x7F) << desplazamiento
+        if not byte & 0x80:
+            return valor, pos
+        desplazamiento += 7
+
+
+def _campos(datos):
+    """[(número de campo, valor)] de un mensaje protobuf (varint, fixed64 y longitud)."""
+    campos = []
+    pos = 0
+    while pos < len(datos):
+        clave, pos = _leer_varint(datos, pos)
+        campo, tipo = clave >> 3, clave & 0x7
+        if tipo == 0:
+            valor, pos = _leer_varint(datos, pos)
+        elif tipo == 1:
+            valor = struct.unpack('<d', datos[pos:pos + 8])[0]
+            pos += 8
+        elif tipo == 2:
+            longitud, pos = _leer_varint(datos, pos)
+            valor = datos[pos:pos + longitud]
+            pos += longitud
+        else:
+            raise AssertionError(f"Tipo de cable inesperado: {tipo}")
+        campos.append((campo, valor))
+    return campos
+
+
+def _empaquetados(datos):
+    valores = []
+    pos = 0
+    while pos < len(datos):
+        valor, pos = _leer_varint(datos, pos)
+        valores.append(valor)
+    return valores
+
+
+def _dezigzag(valor):
+    return (valor >> 1) ^ -(valor & 1)
+
+
+def _decodificar_valor(datos):
+    campo, valor = _campos(datos)[0]
+    if campo == 1:
+        return valor.decode('utf-8')
+    if campo in (3, 5):  # double, uint
+        return valor
+    if campo == 6:
+        return _dezigzag(valor)
+    if campo == 7:
+        return bool(valor)
+    raise AssertionError(f"Campo de Value inesperado: {campo}")
+
+
+def _decodificar_tesela(datos):
+    """{capa: {'version', 'extent', 'features': [(x, y, {atributos})]}}"""
+    capas = {}
+    for campo, capa in _campos(datos):
+        assert campo == 3
+        nombre = None
+        version = extent = None
+        features, claves, valores = [], [], []
+        for campo_capa, valor in _campos(capa):
+            if campo_capa == 1:
+                nombre = valor.decode('utf-8')
+            elif campo_capa == 2:
+                features.append(valor)
+            elif campo_capa == 3:
+                claves.append(valor.decode('utf-8'))
+            elif campo_capa == 4:
+                valores.append(_decodificar_valor(valor))
+            elif campo_capa == 5:
+                extent = valor
+            elif campo_capa == 15:
+                version = valor
+        decodificadas = []
+        for feature in features:
+            campos = dict(_campos(feature))
+            assert campos[3] == 1  # Point
+            comando, x, y = _empaquetados(campos[4])
+            assert comando == (1 << 3) | 1  # MoveTo, un punto
+            tags = _empaquetados(campos.get(2, b''))
+            atributos = {claves[tags[i]]: valores[tags[i + 1]] for i in range(0, len(tags), 2)}
+            decodificadas.append((_dezigzag(x), _dezigzag(y), atributos))
+        capas[nombre] = {'version': version, 'extent': extent, 'features': decodificadas}
+    return capas
+
+
+def test_tesela_se_decodifica_con_puntos_y_atributos():
+    puntos = [
+        (10, 20, {'id': 'R001', 'incidencias': 3, 'activo': True, 'peso': 1.5, 'vacio': None}),
+        (-5, 4100, {'id': 'R002', 'incidencias': -2, 'activo': False}),
+    ]
+    tesela = codificar_tesela([codificar_capa('recursos', puntos)])
+
+    capas = _decodificar_tesela(tesela)
+
+    assert list(capas) == ['recursos']
+    capa = capas['recursos']
+    assert capa['version'] == 2
+    assert capa['extent'] == EXTENT
+    assert capa['features'] == [
+        (10, 20, {'id': 'R001', 'incidencias': 3, 'activo': True, 'peso': 1.5}),
+        (-5, 4100, {'id': 'R002', 'incidencias': -2, 'activo': False}),
+    ]
+
+
+def test_valores_repetidos_se_comparten():
+    puntos = [(0, 0, {'tipo': 'Mupi'}), (1, 1, {'tipo': 'Mupi'}), (2, 2, {'tipo': 'Valla'})]
+    capa = codificar_capa('recursos', puntos)
+
+    valores = [v for campo, v in _campos(capa) if campo == 4]
+    claves = [v for campo, v in _campos(capa) if campo == 3]
+    assert claves == [b'tipo']
+    assert len(valores) == 2
+
+
+def test_bytes_conocidos_de_una_capa_vacia():
+    # version=2, name="a", extent=4096
+    assert codificar_capa('a', []) == b'\x78\x02\x0a\x01a\x28\x80\x20'
+    assert codificar_tesela([b'']) == b'\x1a\x00'
+
+
+def test_proyectar_esquinas_de_la_tesela():
+    assert proyectar(0.0, 0.0, 1, 1, 1) == (0, 0)
+    assert proyectar(0.0, -180.0, 0, 0, 0) == (0, EXTENT // 2)
+
+
+def test_cache_teselas_lru():
+    cache = CacheTeselas(max_teselas=2)
+    generadas = []
+
+    def generar(clave):
+        def hacer():
+            generadas.append(clave)
+            return clave.encode()
+        return hacer
+
+    assert cache.obtener('a', generar('a')) == b'a'
+    assert cache.obtener('a', generar('a')) == b'a'
+    cache.obtener('b', generar('b'))
+    cache.obtener('c', generar('c'))
+    cache.obtener('a', generar('a'))
+
+    assert generadas == ['a', 'b', 'c', 'a']
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['evictions'] == 2
@@ -0,0 +1,72 @@
+"""AlmacenSesiones: caducidad por inactividad y expulsión LRU."""
+import pytest
+
+import sesiones
+from sesiones import AlmacenSesiones
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def time(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(sesiones.time, 'time', reloj.time)
+    return reloj
+
+
+def _almacen(**kwargs):
+    return AlmacenSesiones(lambda: {'token': None}, **kwargs)
+
+
+def test_solo_se_crea_si_se_pide(reloj):
+    almacen = _almacen()
+    assert almacen.obtener('d1') is None
+    assert almacen.obtener('') is None
+
+    sesion = almacen.obtener('d1', crear=True)
+    assert almacen.obtener('d1') is sesion
+    assert almacen.stats()['creadas'] == 1
+
+
+def test_caduca_por_inactividad(reloj):
+    almacen = _almacen(ttl_inactividad=60)
+    almacen.obtener('d1', crear=True)
+
+    reloj.ahora += 59
+    assert almacen.obtener('d1') is not None  # el uso renueva el plazo
+
+    reloj.ahora += 59
+    assert almacen.obtener('d1') is not None
+
+    reloj.ahora += 60
+    assert almacen.obtener('d1') is None
+    assert almacen.stats()['expiradas'] == 1
+
+
+def test_expulsa_la_menos_usada(reloj):
+    almacen = _almacen(max_sesiones=2)
+    almacen.obtener('d1', crear=True)
+    almacen.obtener('d2', crear=True)
+    almacen.obtener('d1')  # d2 pasa a ser la menos usada
+    almacen.obtener('d3', crear=True)
+
+    assert almacen.obtener('d2') is None
+    assert almacen.obtener('d1') is not None
+    assert almacen.obtener('d3') is not None
+    assert almacen.stats()['evictions'] == 1
+
+
+def test_eliminar(reloj):
+    almacen = _almacen()
+    almacen.obtener('d1', crear=True)
+    almacen.eliminar('d1')
+    almacen.eliminar('d1')
+
+    assert almacen.obtener('d1') is None
+    assert almacen.stats()['cerradas'] == 1
@@ -0,0 +1,109 @@
+"""SnapshotCache con cargas falsas en lugar de la BD."""
+import pytest
+
+from snapshots import RECURSOS, Snapshot, SnapshotCache
+
+DESCRIPCION = [('No_', str), ('Name', str), ('PuntoX', float), ('PuntoY', float)]
+
+
+class CacheFalsa(SnapshotCache):
+    """SnapshotCache cuyas cargas devuelven las filas de `self.filas`."""
+
+    def __init__(self, filas, **kwargs):
+        super().__init__(**kwargs)
+        self.filas = filas
+        self.cargas = 0
+
+    def _load(self, funcion, fecha_desde, fecha_hasta):
+        self.cargas += 1
+        return Snapshot(funcion, fecha_desde, fecha_hasta, DESCRIPCION, list(self.filas))
+
+
+def _caducar(snapshot):
+    snapshot.loaded_at -= 10_000
+
+
+@pytest.fixture
+def cache():
+    return CacheFalsa([('R1', 'Uno', 2.6, 39.5), ('R2', 'Dos', 2.7, 39.6)], ttl=60)
+
+
+def test_segunda_peticion_es_un_acierto(cache):
+    primero = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    segundo = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+
+    assert segundo is primero
+    assert cache.cargas == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_funcion_no_permitida(cache):
+    with pytest.raises(ValueError):
+        cache.get('OtraFuncion', '2024-01-01', '2024-01-31')
+
+
+def test_caducado_con_los_mismos_datos_conserva_version(cache):
+    primero = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    version = primero.version
+    _caducar(primero)
+
+    segundo = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+
+    assert cache.cargas == 2
+    assert segundo is primero
+    assert segundo.version == version
+    stats = cache.stats()
+    assert stats['expired'] == 1 and stats['unchanged_reloads'] == 1
+
+
+def test_caducado_con_datos_nuevos_cambia_version(cache):
+    primero = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    _caducar(primero)
+    cache.filas = [('R1', 'Uno', 2.6, 39.5), ('R3', 'Tres', 2.8, 39.7)]
+
+    segundo = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+
+    assert segundo is not primero
+    assert segundo.version != primero.version
+
+
+def test_cambios_desde_una_version(cache):
+    snapshot = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    since = cache.register_version(snapshot)
+    _caducar(snapshot)
+    cache.filas = [('R1', 'Uno bis', 2.6, 39.5), ('R3', 'Tres', 2.8, 39.7)]
+
+    nuevo = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    version, cambiados, eliminados = cache.changes(nuevo, since)
+
+    assert version == nuevo.version
+    assert cambiados == {'R1', 'R3'}
+    assert eliminados == ['R2']
+
+
+def test_cambios_con_version_desconocida(cache):
+    snapshot = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    assert cache.changes(snapshot, 'otro-proceso-1') is None
+    assert cache.changes(snapshot, snapshot.version) is None  # nunca se entregó
+
+
+def test_update_rows_cambia_version_y_aparece_en_cambios(cache):
+    snapshot = cache.get(RECURSOS, '2024-01-01', '2024-01-31')
+    since = cache.register_version(snapshot)
+
+    assert cache.update_rows(RECURSOS, 'No_', 'R2', {'PuntoX': 3.0}) == 1
+
+    version, cambiados, eliminados = cache.changes(snapshot, since)
+    assert version != since
+    assert cambiados == {'R2'} and eliminados == []
+    assert snapshot.value(snapshot.rows[1], 'PuntoX') == 3.0
+
+
+def test_lru_por_numero_de_entradas():
+    cache = CacheFalsa([('R1', 'Uno', 2.6, 39.5)], max_entries=2)
+    for dia in ('01', '02', '03'):
+        cache.get(RECURSOS, f'2024-01-{dia}', f'2024-01-{dia}')
+
+    assert cache.peek(RECURSOS, '2024-01-01', '2024-01-01') is None
+    assert cache.peek(RECURSOS, '2024-01-03', '2024-01-03') is not None
+    assert cache.stats()['evictions'] == 1
@@ -47,6 +47,23 @@ try:
     except:
         pass
 
+    # Precalentar el pool de conexiones para que los hilos de waitress
+    # no paguen el login a SQL Server en la primera carga del mapa
+    try:
+        from config.database import warm_pool, pool_stats
+        abiertas = warm_pool()
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(f"✅ Pool de conexiones precalentado: {abiertas} conexiones ({pool_stats()})\n")
+            f.flush()
+    except Exception as e:
+        # Si la BD no está disponible al arrancar, el pool abrirá conexiones bajo demanda
+        try:
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(f"⚠️ No se pudo precalentar el pool de conexiones: {e}\n")
+                f.flush()
+        except:
+            pass
+
 except Exception as e:
     # Logging de errores
     error_msg = f"❌ Error importando aplicación: {str(e)}\n"